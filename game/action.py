@@ -7,6 +7,7 @@
 import attrs
 from tcod.ecs import Entity  # noqa: TC002
 
+from game.constants import ACTION_COST
 from game.state import State  # noqa: TC001
 
 
@@ -16,6 +17,8 @@ class Success:
 
     message: str = ""
     """Message displayed when this result returns."""
+    cost: int = ACTION_COST
+    """Time this action took at the default speed."""
 
 
 @attrs.define
@@ -3,14 +3,23 @@
 from __future__ import annotations
 
 import logging
+from typing import Final
 
-import tcod.ecs  # noqa: TC002
+import tcod.ecs
+import tcod.ecs.query  # noqa: TC002
 
 import game.states
 from game.action import Action, Impossible, Poll, Success
-from game.actor_tools import can_level_up, update_fov
-from game.components import AI, HP
-from game.messages import add_message
+from game.actions import HostileAI
+from game.actor_tools import can_level_up, get_player_actor, update_fov
+from game.changes import reset_changes
+from game.components import AI, HP, GameTime, Position, UseCrowdAI, VisibleTiles
+from game.constants import ACTION_COST
+from game.crowd import take_crowd_turns
+from game.dormancy import rouse_room
+from game.messages import MessageLog, add_message
+from game.queries import actors_in_query, items_in_query
+from game.scheduler import get_action_time, get_time, iter_due_actors, schedule_turn
 from game.state import State  # noqa: TC001
 from game.tags import IsIn, IsPlayer
 
@@ -22,13 +31,15 @@ def do_player_action(player: tcod.ecs.Entity, action: Action) -> State:
     assert IsPlayer in player.tags
     if player.components[HP] <= 0:
         return game.states.InGame()
+    reset_changes(player.relation_tag[IsIn])
     result = action(player)
     update_fov(player)
+    rouse_room(player.components[Position])
     match result:
-        case Success(message=message):
+        case Success(message=message, cost=cost):
             if message:
                 add_message(player.registry, message)
-            handle_enemy_turns(player.registry, player.relation_tag[IsIn])
+            handle_enemy_turns(player.registry, player.relation_tag[IsIn], get_action_time(player, cost))
         case Poll(state=state):
             return state
         case Impossible(reason=reason):
@@ -40,7 +51,81 @@ def do_player_action(player: tcod.ecs.Entity, action: Action) -> State:
     return game.states.InGame()
 
 
-def handle_enemy_turns(world: tcod.ecs.Registry, map_: tcod.ecs.Entity) -> None:
-    """Perform enemy turns."""
-    for enemy in world.Q.all_of(components=[AI], relations=[(IsIn, map_)]):
-        enemy.components[AI](enemy)
+def _get_log_size(world: tcod.ecs.Registry) -> tuple[int, int]:
+    """Return a value which changes whenever a message is added to the log."""
+    log = world[None].components[MessageLog]
+    return len(log), log[-1].count if log else 0
+
+
+def _get_visible(player: tcod.ecs.Entity, query: tcod.ecs.query.BoundQuery) -> set[tcod.ecs.Entity]:
+    """Return the entities from `query` which are in view of the player."""
+    visible = player.relation_tag[IsIn].components[VisibleTiles]
+    return {entity for entity in query if visible[entity.components[Position].ij]}
+
+
+def do_player_actions(player: tcod.ecs.Entity, action: Action, *, max_turns: int = 1000) -> State:
+    """Repeat a multi-turn action on the player until interrupted, no frames are rendered between turns.
+
+    The action is repeated for as long as it is truthy, such as a FollowPath with steps left.
+    Stops early once the action fails, a message is added, the state changes,
+    a hostile comes into view, or a new item is seen.
+    """
+    world: Final = player.registry
+    map_: Final = player.relation_tag[IsIn]
+    hostiles: Final = actors_in_query(world, map_)
+    items: Final = items_in_query(world, map_)
+    if _get_visible(player, hostiles):
+        add_message(world, "There are enemies in view!", fg="impossible")
+        return game.states.InGame()
+    seen_items = _get_visible(player, items)
+    for _ in range(max_turns):
+        if not action:
+            break  # The action is finished.
+        log_size = _get_log_size(world)
+        state = do_player_action(player, action)
+        if not isinstance(state, game.states.InGame) or _get_log_size(world) != log_size:
+            return state
+        if player.relation_tag[IsIn] is not map_ or _get_visible(player, hostiles):
+            return state
+        visible_items = _get_visible(player, items)
+        if not visible_items <= seen_items:
+            return state
+        seen_items |= visible_items
+    return game.states.InGame()
+
+
+def _take_turn(enemy: tcod.ecs.Entity) -> None:
+    """Perform the turn of an enemy and schedule its next turn."""
+    result = enemy.components[AI](enemy)
+    if AI in enemy.components:
+        cost = result.cost if isinstance(result, Success) else ACTION_COST
+        schedule_turn(enemy, get_time(enemy.registry) + get_action_time(enemy, cost))
+
+
+def _handle_crowd_turns(world: tcod.ecs.Registry, map_: tcod.ecs.Entity, end: int) -> None:
+    """Perform the turns of the enemies due before `end`, with HostileAI enemies which see the player batched together.
+
+    Enemies act in waves, an enemy which is due again before `end` acts in a later wave.
+    Each enemy keeps the time it was due at, its turn is taken and rescheduled from that time.
+    """
+    player = get_player_actor(world)
+    while due := [(get_time(world), enemy) for enemy in iter_due_actors(map_, end)]:
+        crowd = [enemy for _, enemy in due if isinstance(enemy.components[AI], HostileAI)]
+        remaining = set(take_crowd_turns(crowd, player)) if player.relation_tag[IsIn] is map_ else set(crowd)
+        for time, enemy in due:
+            world[None].components[GameTime] = time
+            if enemy in remaining or not isinstance(enemy.components.get(AI), HostileAI):
+                _take_turn(enemy)
+            elif AI in enemy.components:
+                schedule_turn(enemy, time + get_action_time(enemy, ACTION_COST))
+
+
+def handle_enemy_turns(world: tcod.ecs.Registry, map_: tcod.ecs.Entity, duration: int = ACTION_COST) -> None:
+    """Advance the game time by `duration` and perform the turns of the enemies due within that time."""
+    end: Final = get_time(world) + duration
+    if world[None].components.get(UseCrowdAI, False):
+        _handle_crowd_turns(world, map_, end)
+    else:
+        for enemy in iter_due_actors(map_, end):
+            _take_turn(enemy)
+    world[None].components[GameTime] = end
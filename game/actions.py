@@ -2,24 +2,34 @@
 
 from __future__ import annotations
 
+import itertools
+from collections import deque
 from typing import Final, Literal, Self
 
 import attrs
+import numpy as np
 import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
 
 from game.action import ActionResult, Impossible, Success
-from game.actor_tools import update_fov
+from game.actor_tools import get_player_actor, update_fov
+from game.catch_up import catch_up, leave_map
 from game.combat import apply_damage, melee_damage
-from game.components import EquipSlot, MapShape, Name, Position, Tiles, VisibleTiles
+from game.components import EquipSlot, MapShape, MemoryTiles, Name, Position, Tiles
+from game.constants import DORMANT_COST, MELEE_NOISE_RADIUS, WAKE_RADIUS
+from game.dormancy import make_noise, park, unpark
 from game.entity_tools import get_name
+from game.explore import get_frontier_distance, is_frontier
 from game.item import ApplyAction
-from game.item_tools import add_to_inventory, equip_item, unequip_item
+from game.item_tools import add_to_inventory, equip_item, remove_from_inventory, unequip_item
 from game.map import MapKey
-from game.map_tools import get_map
+from game.map_tools import get_map, get_tile_layer
 from game.messages import add_message
-from game.tags import EquippedBy, IsAlive, IsBlocking, IsIn, IsItem, IsPlayer
+from game.occupancy import get_entities_at, is_blocked
+from game.perception import can_see
+from game.tags import EquippedBy, IsAlive, IsIn, IsItem, IsPlayer
 from game.tiles import TILES
-from game.travel import path_to
+from game.travel import get_distance_field, path_downhill, path_to, plan_path
 
 
 @attrs.define
@@ -40,7 +50,7 @@ def __call__(self, entity: tcod.ecs.Entity) -> ActionResult:
         tile_index = new_position.map.components[Tiles][new_position.ij]
         if TILES["walk_cost"][tile_index] == 0:
             return Impossible(f"""Blocked by {TILES["name"][tile_index]}.""")
-        if entity.registry.Q.all_of(tags=[IsBlocking, new_position]):
+        if is_blocked(new_position):
             return Impossible("Something is in the way.")  # Blocked by entity
 
         entity.components[Position] += self.direction
@@ -57,7 +67,7 @@ def __call__(self, entity: tcod.ecs.Entity) -> ActionResult:
         """Check and apply the movement."""
         new_position = entity.components[Position] + self.direction
         try:
-            (target,) = entity.registry.Q.all_of(tags=[IsAlive, new_position])
+            (target,) = (other for other in get_entities_at(new_position) if IsAlive in other.tags)
         except ValueError:
             return Impossible("Nothing there to attack.")  # No actor at position.
 
@@ -69,6 +79,7 @@ def __call__(self, entity: tcod.ecs.Entity) -> ActionResult:
             apply_damage(target, damage, blame=entity)
         else:
             add_message(entity.registry, f"{attack_desc} but does no damage.", attack_color)
+        make_noise(new_position, MELEE_NOISE_RADIUS)
 
         return Success()
 
@@ -84,7 +95,7 @@ def __call__(self, entity: tcod.ecs.Entity) -> ActionResult:
         if self.direction == (0, 0):
             return wait(entity)
         new_position = entity.components[Position] + self.direction
-        if entity.registry.Q.all_of(tags=[IsAlive, new_position]):
+        if any(IsAlive in other.tags for other in get_entities_at(new_position)):
             return Melee(self.direction)(entity)
         return Move(self.direction)(entity)
 
@@ -98,51 +109,152 @@ def wait(entity: tcod.ecs.Entity) -> Success:  # noqa: ARG001
 class FollowPath:
     """Follow path action."""
 
-    path: list[Position] = attrs.field(factory=list)
+    path: deque[Position] = attrs.field(factory=deque)
 
     @classmethod
     def to_dest(cls, actor: tcod.ecs.Entity, dest: Position) -> Self:
-        """Path to a destination."""
-        return cls(path_to(actor, dest))
+        """Shortest path to a destination."""
+        return cls(deque(path_to(actor, dest)))
+
+    @classmethod
+    def over_memory(cls, actor: tcod.ecs.Entity, dest: Position) -> Self:
+        """Shortest path to a destination over the tiles remembered by the player, so unseen tiles are avoided."""
+        return cls(deque(path_to(actor, dest, cost=TILES["walk_cost"][dest.map.components[MemoryTiles]])))
+
+    @classmethod
+    def planned(cls, actor: tcod.ecs.Entity, dest: Position) -> Self:
+        """Path to a destination which may be planned over the room graph, see `plan_path`."""
+        return cls(deque(plan_path(actor, dest)))
+
+    @classmethod
+    def downhill(cls, actor: tcod.ecs.Entity, distance: NDArray[np.int32]) -> Self:
+        """Path downhill along a distance field, such as one from `get_distance_field`."""
+        return cls(deque(path_downhill(actor, distance)))
 
     def __bool__(self) -> bool:
         """Return True if a path exists."""
         return bool(self.path)
 
+    def is_valid(self, actor: tcod.ecs.Entity, dest: Position, *, lookahead: int = 2) -> bool:
+        """Return True if this path can still be followed by `actor` to reach `dest`.
+
+        The path must start next to the actor and end next to `dest`,
+        and none of its next `lookahead` steps may have a blocking entity other than at `dest`.
+        """
+        if not self.path:
+            return False
+        if not (_is_adjacent(self.path[0], actor.components[Position]) and _is_adjacent(self.path[-1], dest)):
+            return False
+        return not any(is_blocked(step) for step in itertools.islice(self.path, lookahead) if step != dest)
+
     def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
         """Move along the path."""
         if not self.path:
             return Impossible("No path.")
         actor_pos: Final = actor.components[Position]
-        dest: Final = self.path.pop(0)
+        dest: Final = self.path.popleft()
         result = Move((dest.x - actor_pos.x, dest.y - actor_pos.y))(actor)
         if not isinstance(result, Success):
-            self.path = []
+            self.path.clear()
         return result
 
 
+@attrs.define
+class Run:
+    """Move in a direction until the surroundings change, such as at a branch in a corridor."""
+
+    direction: tuple[int, int]
+    sides: tuple[bool, bool] | None = None
+    """Which tiles to either side of the actor were walkable after the first step."""
+    stopped: bool = False
+
+    def __bool__(self) -> bool:
+        """Return True while the run can continue."""
+        return not self.stopped
+
+    def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
+        """Move one step, then stop if the sides have changed or the way ahead is blocked."""
+        result = Move(self.direction)(actor)
+        actor_pos: Final = actor.components[Position]
+        dx, dy = self.direction
+        left: Final = -dy, dx
+        right: Final = dy, -dx
+        sides = _is_walkable(actor_pos + left), _is_walkable(actor_pos + right)
+        if self.sides is None:
+            self.sides = sides
+        if not isinstance(result, Success) or sides != self.sides or not _is_walkable(actor_pos + self.direction):
+            self.stopped = True
+        return result
+
+
+def _is_walkable(pos: Position) -> bool:
+    """Return True if the tile at `pos` can be walked on."""
+    height, width = pos.map.components[MapShape]
+    return 0 <= pos.x < width and 0 <= pos.y < height and get_tile_layer(pos.map, "walk_cost").item(pos.ij) > 0
+
+
+def _is_adjacent(a: Position, b: Position) -> bool:
+    """Return True if two positions are the same or next to each other."""
+    return a.map is b.map and abs(a.x - b.x) <= 1 and abs(a.y - b.y) <= 1
+
+
 @attrs.define
 class HostileAI:
     """Generic hostile AI."""
 
     path: FollowPath = attrs.field(factory=FollowPath)
+    replans: int = 0
+    """Number of times a new path was planned."""
+    reuses: int = 0
+    """Number of times an existing path was kept instead of planning a new one."""
+    last_seen: Position | None = None
+    """Where the player was last seen if no path was kept at the time, such as after a crowd turn."""
 
     def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
         """Follow and attack player."""
-        (target,) = actor.registry.Q.all_of(tags=[IsPlayer])
+        target = get_player_actor(actor.registry)
         actor_pos: Final = actor.components[Position]
         target_pos: Final = target.components[Position]
-        map_: Final = actor.relation_tag[IsIn]
         dx: Final = target_pos.x - actor_pos.x
         dy: Final = target_pos.y - actor_pos.y
         distance: Final = max(abs(dx), abs(dy))  # Chebyshev distance.
-        if map_.components[VisibleTiles][actor_pos.ij]:
+        unpark(actor)
+        sees_target: Final = distance <= WAKE_RADIUS and can_see(actor, target_pos)
+        if sees_target:
             if distance <= 1:
                 return Melee((dx, dy))(actor)
-            self.path = FollowPath.to_dest(actor, target_pos)
+            if self.path.is_valid(actor, target_pos):
+                self.reuses += 1
+            else:
+                self.replans += 1
+                self.path = FollowPath.downhill(actor, get_distance_field(target_pos))
+        elif not self.path and self.last_seen is not None:
+            self.path = FollowPath.planned(actor, self.last_seen)
+        self.last_seen = None
         if self.path:
             return self.path(actor)
-        return wait(actor)
+        if sees_target:
+            return wait(actor)  # Every step towards the target is blocked for now.
+        return park(actor, DORMANT_COST * max(1, distance // WAKE_RADIUS))  # Distant monsters check less often.
+
+
+@attrs.define
+class AutoExplore:
+    """Walk towards the nearest unexplored area."""
+
+    path: FollowPath = attrs.field(factory=FollowPath)
+
+    def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
+        """Take one step towards the frontier, keeping the current path while it still leads to the frontier."""
+        map_: Final = actor.relation_tag[IsIn]
+        if not self.path or not is_frontier(map_, self.path.path[-1].ij):
+            distance = get_frontier_distance(map_)
+            if distance.item(actor.components[Position].ij) == np.iinfo(distance.dtype).max:
+                return Impossible("There is nothing left to explore.")
+            self.path = FollowPath.downhill(actor, distance)
+        if not self.path:
+            return Impossible("Something is in the way.")
+        return self.path(actor)
 
 
 @attrs.define
@@ -151,10 +263,10 @@ class PickupItem:
 
     def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
         """Check for and pickup item."""
-        items_here = actor.registry.Q.all_of(tags=[IsItem, actor.components[Position]]).get_entities()
+        items_here = [entity for entity in get_entities_at(actor.components[Position]) if IsItem in entity.tags]
         if not items_here:
             return Impossible("There is nothing here to pick up.")
-        item = next(iter(items_here))
+        item = items_here[0]
 
         return add_to_inventory(actor, item)
 
@@ -192,7 +304,7 @@ def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
         assert item.relation_tag[IsIn] is actor
         add_message(actor.registry, f"""You drop the {item.components.get(Name, "?")}!""")
         unequip_item(item)
-        del item.relation_tag[IsIn]
+        remove_from_inventory(item)
         item.components[Position] = actor.components[Position]
         return Success()
 
@@ -234,8 +346,10 @@ class MoveLevel:
     def __call__(self, actor: tcod.ecs.Entity) -> ActionResult:
         """Move actor to the exit passage of the destination map."""
         update_fov(actor, clear=True)
+        leave_map(actor.relation_tag[IsIn])
 
         dest_map = get_map(actor.registry, self.dest_map)
+        catch_up(dest_map)
         (dest_stairs,) = actor.registry.Q.all_of(tags=self.exit_tag, relations=[(IsIn, dest_map)]).get_entities()
         add_message(actor.registry, self.message)
         actor.components[Position] = dest_stairs.components[Position]
@@ -0,0 +1,157 @@
+"""Columnar tables of the numeric stats of the actors on a map."""
+
+from __future__ import annotations
+
+from typing import Final, Self
+
+import attrs
+import numpy as np
+import tcod.ecs
+import tcod.ecs.callbacks
+import tcod.ecs.typing
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.components import HP, XP, Defense, MaxHP, Position, Power
+from game.tags import IsActor, IsIn
+
+STAT_COLUMNS: Final = {"hp": HP, "max_hp": MaxHP, "power": Power, "defense": Defense, "xp": XP}
+"""Columns of an actor table mirroring a component, missing components are stored as zero."""
+
+COLUMNS: Final = (*STAT_COLUMNS, "x", "y")
+"""Every column of an actor table, `x` and `y` mirror the actor Position."""
+
+
+@attrs.define(eq=False)
+class ActorTable:
+    """Cached copy of the stats and positions of the IsActor entities on a map, one row per actor.
+
+    Components remain the source of truth, rows are updated by callbacks whenever the components change.
+    Rows are not kept in any particular order, the last row is moved into the place of a removed row.
+    """
+
+    entities: list[tcod.ecs.Entity] = attrs.field(factory=list)
+    """The actor of each row."""
+    rows: dict[tcod.ecs.Entity, int] = attrs.field(factory=dict)
+    """The row of each actor."""
+    columns: dict[str, NDArray[np.int32]] = attrs.field(
+        factory=lambda: {name: np.zeros(0, dtype=np.int32) for name in COLUMNS}
+    )
+    """Column arrays, these may have unused space after the last row."""
+    built: bool = False
+    """False until the table is filled by `get_actor_table`, an unpickled table is empty and must be rebuilt."""
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.entities)
+
+    def __getitem__(self, name: str) -> NDArray[np.int32]:
+        """Return the read-only values of a column for every row."""
+        column = self.columns[name][: len(self.entities)]
+        column.flags.writeable = False
+        return column
+
+    def update_row(self, entity: tcod.ecs.Entity) -> None:
+        """Copy the current stats and position of an actor into its row."""
+        row = self.rows[entity]
+        for name, component in STAT_COLUMNS.items():
+            self.columns[name][row] = entity.components.get(component, 0)
+        pos = entity.components[Position]
+        self.columns["x"][row] = pos.x
+        self.columns["y"][row] = pos.y
+
+    def add(self, entity: tcod.ecs.Entity) -> None:
+        """Add a row for an actor."""
+        row = len(self.entities)
+        if row >= len(self.columns["x"]):
+            for name, column in self.columns.items():
+                self.columns[name] = np.resize(column, max(16, row * 2))
+        self.entities.append(entity)
+        self.rows[entity] = row
+        self.update_row(entity)
+
+    def remove(self, entity: tcod.ecs.Entity) -> None:
+        """Remove the row of an actor."""
+        row = self.rows.pop(entity)
+        last = self.entities.pop()
+        if last is entity:
+            return
+        self.entities[row] = last
+        self.rows[last] = row
+        for column in self.columns.values():
+            column[row] = column[len(self.entities)]
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the table when pickled, it is marked as unbuilt so that `get_actor_table` rebuilds it."""
+        return (self.__class__, ())
+
+
+def _get_built(map_: tcod.ecs.Entity) -> ActorTable | None:
+    """Return the actor table of a map if it is built, otherwise it is rebuilt when next used."""
+    table = map_.components.get(ActorTable)
+    return table if table is not None and table.built else None
+
+
+def get_actor_table(map_: tcod.ecs.Entity) -> ActorTable:
+    """Return the actor table of a map, building it if it is not cached.
+
+    Once built the table is kept in sync with the actors of the map as their components change.
+    """
+    table = _get_built(map_)
+    if table is None:
+        table = map_.components[ActorTable] = ActorTable(built=True)
+        for actor in map_.registry.Q.all_of(components=[Position], tags=[IsActor], relations=[(IsIn, map_)]):
+            table.add(actor)
+    return table
+
+
+def update_column(map_: tcod.ecs.Entity, name: str, values: NDArray[np.integer]) -> None:
+    """Assign new values to a stat column of the actor table of a map, one value per row.
+
+    Only the components of the actors whose value has changed are written.
+    """
+    table = get_actor_table(map_)
+    component = STAT_COLUMNS[name]
+    for row in np.flatnonzero(table[name] != values).tolist():
+        table.entities[row].components[component] = int(values[row])
+
+
+def _get_table(entity: tcod.ecs.Entity) -> ActorTable | None:
+    """Return the actor table which has a row for `entity`, if any."""
+    pos = entity.components.get(Position)
+    if pos is None:
+        return None
+    table = _get_built(pos.map)
+    return table if table is not None and entity in table.rows else None
+
+
+def _track_stat(name: str, component: tcod.ecs.typing.ComponentKey[int]) -> None:
+    """Register a callback which updates the `name` column of an actor when its `component` changes."""
+
+    def on_stat_changed(entity: tcod.ecs.Entity, old: int | None, new: int | None) -> None:
+        if old != new and (table := _get_table(entity)) is not None:
+            table.columns[name][table.rows[entity]] = entity.components.get(component, 0)
+
+    tcod.ecs.callbacks.register_component_changed(component=component)(on_stat_changed)
+
+
+for _name, _component in STAT_COLUMNS.items():
+    _track_stat(_name, _component)
+
+
+@tcod.ecs.callbacks.register_component_changed(component=Position)
+def on_actor_moved(entity: tcod.ecs.Entity, old: Position | None, new: Position | None) -> None:
+    """Add, move, or remove the row of an actor as it moves on or between maps."""
+    if old == new or IsActor not in entity.tags:
+        return
+    old_table = _get_built(old.map) if old is not None else None
+    new_table = _get_built(new.map) if new is not None else None
+    if old_table is not None and entity in old_table.rows and old_table is not new_table:
+        old_table.remove(entity)
+    if new is None or new_table is None:
+        return
+    if entity not in new_table.rows:
+        new_table.add(entity)
+        return
+    row = new_table.rows[entity]
+    new_table.columns["x"][row] = new.x
+    new_table.columns["y"][row] = new.y
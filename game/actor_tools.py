@@ -5,66 +5,140 @@
 from typing import Final
 
 import numpy as np
-import tcod.constants
-import tcod.ecs
-import tcod.map
-
-from game.components import XP, Graphic, Level, MemoryTiles, Name, Position, Tiles, VisibleTiles
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.components import (
+    XP,
+    FOVSource,
+    GhostColors,
+    GhostGlyphs,
+    GhostNameIds,
+    GhostNames,
+    GhostNameTable,
+    Graphic,
+    Level,
+    MapShape,
+    MemoryTiles,
+    MemoryVersion,
+    Name,
+    Position,
+    Tiles,
+    TilesVersion,
+    VisibleTiles,
+)
+from game.dormancy import rouse_seen
+from game.entity_tools import get_render_order
+from game.explore import update_frontier
+from game.map_tools import get_radius_slices
 from game.messages import add_message
-from game.tags import IsAlive, IsBlocking, IsGhost, IsIn, IsPlayer
-from game.tiles import TILES
+from game.occupancy import in_mask, set_blocking
+from game.overview import mark_overview_dirty
+from game.perception import get_fov, get_sight_radius
+from game.queries import player_query
+from game.tags import IsAlive, IsIn, IsPlayer
 
 
 def get_player_actor(world: tcod.ecs.Registry) -> tcod.ecs.Entity:
     """Return the active player entity."""
-    (player,) = world.Q.all_of(tags=[IsPlayer])
+    (player,) = player_query(world)
     return player
 
 
 def update_fov(actor: tcod.ecs.Entity, *, clear: bool = False) -> None:
-    """Update the FOV of an actor."""
+    """Update the FOV of an actor.
+
+    Only the area within the FOV radius is updated.
+    Nothing is done if the actor has not moved and the map tiles have not changed since the last update.
+    """
     assert IsPlayer in actor.tags
     map_: Final = actor.relation_tag[IsIn]
-    transparency: Final = TILES["transparent"][map_.components[Tiles]]
-    old_visible: Final = map_.components[VisibleTiles]
-    if clear:  # Unset visibility, for before level transitions.
-        map_.components[VisibleTiles][:] = False
-        new_visible = map_.components[VisibleTiles]
+    map_shape: Final = map_.components[MapShape]
+    old_source: Final = map_.components.get(FOVSource)
+    new_source: Final = (
+        None  # Unset visibility, for before level transitions.
+        if clear
+        else FOVSource(actor.components[Position].ij, get_sight_radius(actor), map_.components.get(TilesVersion, 0))
+    )
+    if old_source == new_source:
+        return  # FOV is already up-to-date.
+
+    # The area which was visible before this update, or the whole map if unknown.
+    old_area: Final = (
+        get_radius_slices(map_shape, old_source.pov_ij, old_source.radius)[1]
+        if old_source is not None
+        else (slice(0, map_shape.height), slice(0, map_shape.width))
+    )
+    new_area: Final = (
+        get_radius_slices(map_shape, new_source.pov_ij, new_source.radius)[1] if new_source is not None else old_area
+    )
+    area: Final = (  # Union of the old and new areas, nothing outside of this area is changed.
+        slice(min(old_area[0].start, new_area[0].start), max(old_area[0].stop, new_area[0].stop)),
+        slice(min(old_area[1].start, new_area[1].start), max(old_area[1].stop, new_area[1].stop)),
+    )
+
+    visible: Final = map_.components[VisibleTiles]
+    old_visible: Final = visible[area].copy()
+    visible[old_area] = False
+    if new_source is not None:
+        _, visible[new_area] = get_fov(map_, new_source.pov_ij, new_source.radius)
+        memory = map_.components[MemoryTiles]
+        memory[new_area] = np.where(visible[new_area], map_.components[Tiles][new_area], memory[new_area])
+        map_.components[MemoryVersion] = map_.components.get(MemoryVersion, 0) + 1
+        update_frontier(map_, new_area)
+        map_.components[FOVSource] = new_source
     else:
-        map_.components[VisibleTiles] = new_visible = tcod.map.compute_fov(
-            transparency,
-            pov=actor.components[Position].ij,
-            radius=10,
-            algorithm=tcod.constants.FOV_SYMMETRIC_SHADOWCAST,
-        )
-    map_.components[MemoryTiles] = np.where(new_visible, map_.components[Tiles], map_.components[MemoryTiles])
+        map_.components.pop(FOVSource, None)
+    new_visible: Final = visible[area]
+    mark_overview_dirty(map_, area)
 
     now_invisible: Final = old_visible & ~new_visible  # Tiles which have gone out of view, should leave ghosts
-    all_visible: Final = old_visible & new_visible  # Tiles visible in old and new FOV, should clear ghosts
-
-    world: Final = actor.registry
-    # Remove visible ghosts
-    for entity in world.Q.all_of(components=[Position], tags=[IsGhost], relations=[(IsIn, map_)]):
-        if all_visible[entity.components[Position].ij]:
-            entity.clear()
-    # Add ghosts for entities going out of view
-    for entity in world.Q.all_of(components=[Position, Graphic], relations=[(IsIn, map_)]).none_of(tags=[IsGhost]):
-        pos = entity.components[Position]
-        if not now_invisible[pos.ij]:
-            continue
-        ghost = world[object()]
-        ghost.tags.add(IsGhost)
-        ghost.components[Position] = pos
-        ghost.components[Graphic] = entity.components[Graphic]
-        if Name in entity.components:
-            ghost.components[Name] = entity.components[Name]
+
+    rouse_seen(map_, new_visible, area)  # Monsters in view are never left dormant.
+
+    # Forget ghosts in view, visible entities are rendered directly
+    map_.components[GhostGlyphs][area][new_visible] = 0
+    map_.components[GhostNames][area][new_visible] = 0
+    if now_invisible.any():
+        _add_ghosts(map_, area, now_invisible)
+
+
+def _add_ghosts(map_: tcod.ecs.Entity, area: tuple[slice, slice], mask: NDArray[np.bool]) -> None:
+    """Remember the entities on a map within `mask`, which covers `area` of the map."""
+    ghosts: dict[tuple[int, int], list[tcod.ecs.Entity]] = {}
+    for entity in in_mask(map_, mask, area=area):
+        if Graphic in entity.components and IsPlayer not in entity.tags:
+            ghosts.setdefault(entity.components[Position].ij, []).append(entity)
+    if not ghosts:
+        return
+
+    # Only the most important graphic of each tile is kept, but all names are kept
+    name_table: Final = map_.components[GhostNameTable]
+    name_ids: Final = map_.components[GhostNameIds]
+    glyphs: list[int] = []
+    colors: list[tuple[int, int, int]] = []
+    ghost_names: list[int] = []
+    for entities in ghosts.values():
+        graphic = max(entities, key=get_render_order).components[Graphic]
+        name = ", ".join(entity.components[Name] for entity in entities if Name in entity.components)
+        if name not in name_ids:
+            name_ids[name] = len(name_table)
+            name_table.append(name)
+        glyphs.append(graphic.ch)
+        colors.append(graphic.fg)
+        ghost_names.append(name_ids[name])
+
+    ghosts_ij: Final = tuple(np.transpose(list(ghosts)))
+    map_.components[GhostGlyphs][ghosts_ij] = glyphs
+    map_.components[GhostColors][ghosts_ij] = colors
+    map_.components[GhostNames][ghosts_ij] = ghost_names
 
 
 def spawn_actor(template: tcod.ecs.Entity, position: Position) -> tcod.ecs.Entity:
     """Spawn a new actor at a location and return the new entity."""
     actor = template.instantiate()
     actor.components[Position] = position
-    actor.tags.add(IsBlocking)
+    set_blocking(actor, True)
     actor.tags.add(IsAlive)
     return actor
 
@@ -0,0 +1,91 @@
+"""Coarse simulation of the time missed by maps the player has left."""
+
+from __future__ import annotations
+
+import math
+from random import Random
+from typing import Final
+
+import numpy as np
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.actor_table import get_actor_table, update_column
+from game.components import AI, LastActiveTime, Position
+from game.constants import ACTION_COST, CATCH_UP_HEAL_TURNS, CATCH_UP_MAX_WANDER, CATCH_UP_REGROUP_TURNS
+from game.dormancy import park, unpark
+from game.map_tools import get_radius_slices, get_tile_layer
+from game.occupancy import get_occupancy
+from game.queries import actors_in_query
+from game.scheduler import get_time
+from game.tags import IsDormant, IsIn
+from game.travel import RoomGraph
+
+
+def leave_map(map_: tcod.ecs.Entity) -> None:
+    """Record that the player has left a map, its actors stop taking turns until the player returns."""
+    map_.components[LastActiveTime] = get_time(map_.registry)
+
+
+def _pick_space(rng: Random, free: NDArray[np.bool], area: tuple[slice, ...]) -> tuple[int, int] | None:
+    """Return a random free `ij` coordinate within `area` of `free`, or None if there are none."""
+    candidates: Final = np.argwhere(free[area])
+    if not len(candidates):
+        return None
+    i, j = candidates[rng.randrange(len(candidates))].tolist()
+    return i + (area[0].start or 0), j + (area[1].start or 0)
+
+
+def _move_actor(actor: tcod.ecs.Entity, ij: tuple[int, int]) -> None:
+    """Place an actor at `ij` of its map, keeping its dormant state and discarding the plans of its AI."""
+    is_dormant: Final = IsDormant in actor.tags
+    unpark(actor)  # The dormant index is by position.
+    actor.components[Position] = actor.components[Position].replace(x=ij[1], y=ij[0])
+    if is_dormant:
+        park(actor)
+    actor.components[AI] = type(actor.components[AI])()  # Paths planned before the move are no longer valid.
+
+
+def catch_up(map_: tcod.ecs.Entity) -> None:
+    """Coarsely simulate the time a map has missed since `leave_map`, called when the player returns to it.
+
+    Instead of taking every missed turn, each actor heals by `CATCH_UP_HEAL_TURNS` and moves once:
+    to a random space within a distance growing with the square root of the missed turns,
+    or after `CATCH_UP_REGROUP_TURNS` into the room of another random actor.
+    Stairs are kept clear so that the player can always arrive on them.
+    """
+    last_active: Final = map_.components.pop(LastActiveTime, None)
+    if last_active is None:
+        return
+    world: Final = map_.registry
+    turns: Final = (get_time(world) - last_active) // ACTION_COST
+    if turns <= 0:
+        return
+    rng: Final = world[None].components[Random]
+    actors: Final = list(actors_in_query(world, map_))
+    rng.shuffle(actors)
+
+    table: Final = get_actor_table(map_)
+    hp: Final = table["hp"]
+    update_column(map_, "hp", np.where(hp > 0, np.minimum(hp + turns // CATCH_UP_HEAL_TURNS, table["max_hp"]), hp))
+
+    free: Final = (get_tile_layer(map_, "walk_cost") > 0) & (get_occupancy(map_).blockers == 0)
+    for stairs in world.Q.all_of(components=[Position], relations=[(IsIn, map_)]).any_of(
+        tags=["UpStairs", "DownStairs"]
+    ):
+        free[stairs.components[Position].ij] = False
+    room_graph: Final = map_.components.get(RoomGraph)
+    wander_radius: Final = min(CATCH_UP_MAX_WANDER, math.isqrt(turns))
+    for actor in actors:
+        pos = actor.components[Position]
+        area: tuple[slice, ...] = get_radius_slices(free.shape, pos.ij, wander_radius)[1]
+        if room_graph is not None and turns >= CATCH_UP_REGROUP_TURNS and len(actors) > 1:
+            room = room_graph.room_at(rng.choice(actors).components[Position].ij)
+            if room != -1:
+                area = room_graph.rooms[room]
+        dest = _pick_space(rng, free, area)
+        if dest is None:
+            continue
+        free[pos.ij] = True
+        free[dest] = False
+        _move_actor(actor, dest)
@@ -0,0 +1,130 @@
+"""Tracking of what has changed on a map during the current turn."""
+
+from __future__ import annotations
+
+from typing import Self
+
+import attrs
+import tcod.ecs
+import tcod.ecs.callbacks
+
+from game.components import HP, XP, Defense, MaxHP, Position, Power, Tiles, TilesVersion
+
+
+@attrs.define(eq=False)
+class Changes:
+    """Tiles of a map which have changed since the last turn boundary.
+
+    Changes are only recorded for maps which have this component, see `get_changes`.
+    """
+
+    tiles_version: int = -1
+    """The TilesVersion of the map at the last turn boundary, -1 if unknown such as after a load."""
+    tiles: list[tuple[slice, ...]] = attrs.field(factory=list)
+    """Areas of tiles changed this turn, the whole map is included if a change had no known area."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the changes when pickled, the unknown version makes users of `tiles` start over."""
+        return (self.__class__, ())
+
+
+@attrs.define(eq=False)
+class EntityChanges:
+    """Entities of a map which have changed since the last turn boundary.
+
+    These are only recorded for maps where a consumer has asked for them with `get_entity_changes`,
+    so that other maps do not pay for tracking every move and stat change.
+    """
+
+    moved: set[tcod.ecs.Entity] = attrs.field(factory=set)
+    """Entities which moved within the map."""
+    spawned: set[tcod.ecs.Entity] = attrs.field(factory=set)
+    """Entities which were placed on the map, such as from being created, dropped, or arriving from another map."""
+    removed: set[tcod.ecs.Entity] = attrs.field(factory=set)
+    """Entities which left the map, such as from being deleted, picked up, or moving to another map."""
+    stats: set[tcod.ecs.Entity] = attrs.field(factory=set)
+    """Entities on the map with a changed HP, MaxHP, Power, Defense, or XP."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the changes when pickled, a consumer must treat a loaded map as entirely changed."""
+        return (self.__class__, ())
+
+
+def get_changes(map_: tcod.ecs.Entity) -> Changes:
+    """Return the changes of a map this turn, starting to track them if they were not already tracked."""
+    changes = map_.components.get(Changes)
+    if changes is None:
+        changes = map_.components[Changes] = Changes(tiles_version=map_.components.get(TilesVersion, 0))
+    return changes
+
+
+def get_entity_changes(map_: tcod.ecs.Entity) -> EntityChanges:
+    """Return the entity changes of a map this turn, starting to track them if they were not already tracked.
+
+    Only changes made after the first call are recorded.
+    """
+    changes = map_.components.get(EntityChanges)
+    if changes is None:
+        changes = map_.components[EntityChanges] = EntityChanges()
+    return changes
+
+
+def reset_changes(map_: tcod.ecs.Entity) -> None:
+    """Forget the changes of a map, this is called at the start of each turn."""
+    changes = get_changes(map_)
+    changes.tiles_version = map_.components.get(TilesVersion, 0)
+    changes.tiles.clear()
+    entity_changes = map_.components.get(EntityChanges)
+    if entity_changes is not None:
+        entity_changes.moved.clear()
+        entity_changes.spawned.clear()
+        entity_changes.removed.clear()
+        entity_changes.stats.clear()
+
+
+def note_tiles_changed(map_: tcod.ecs.Entity, area: tuple[slice, ...] | None) -> None:
+    """Record that the tiles of a map within `area`, or all of them if `area` is None, have changed."""
+    changes = map_.components.get(Changes)
+    if changes is not None:
+        changes.tiles.append(area if area is not None else (slice(None), slice(None)))
+
+
+@tcod.ecs.callbacks.register_component_changed(component=Tiles)
+def on_tiles_replaced(entity: tcod.ecs.Entity, old: object, new: object) -> None:
+    """Record that every tile of a map has changed when its tiles array is replaced."""
+    if old is not new:
+        note_tiles_changed(entity, None)
+
+
+@tcod.ecs.callbacks.register_component_changed(component=Position)
+def on_entity_moved(entity: tcod.ecs.Entity, old: Position | None, new: Position | None) -> None:
+    """Record entities moving on, within, or off of a map."""
+    if old == new:
+        return
+    old_changes = old.map.components.get(EntityChanges) if old is not None else None
+    new_changes = new.map.components.get(EntityChanges) if new is not None else None
+    if old_changes is new_changes:
+        if old_changes is not None:
+            old_changes.moved.add(entity)
+        return
+    if old_changes is not None:
+        old_changes.removed.add(entity)
+        old_changes.spawned.discard(entity)
+    if new_changes is not None:
+        new_changes.spawned.add(entity)
+        new_changes.removed.discard(entity)
+
+
+@tcod.ecs.callbacks.register_component_changed(component=HP)
+@tcod.ecs.callbacks.register_component_changed(component=MaxHP)
+@tcod.ecs.callbacks.register_component_changed(component=Power)
+@tcod.ecs.callbacks.register_component_changed(component=Defense)
+@tcod.ecs.callbacks.register_component_changed(component=XP)
+def on_stat_changed(entity: tcod.ecs.Entity, old: int | None, new: int | None) -> None:
+    """Record entities with changed stats."""
+    if old == new:
+        return
+    pos = entity.components.get(Position)
+    changes = pos.map.components.get(EntityChanges) if pos is not None else None
+    if changes is not None:
+        changes.stats.add(entity)
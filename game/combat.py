@@ -3,30 +3,84 @@
 from __future__ import annotations
 
 import logging
+from typing import Self
 
-import tcod.ecs  # noqa: TC002
+import attrs
+import tcod.ecs
+import tcod.ecs.callbacks
 
 from game.components import AI, HP, XP, Defense, DefenseBonus, Graphic, MaxHP, Name, Power, PowerBonus, RewardXP
+from game.dormancy import unpark
 from game.messages import add_message
-from game.tags import Affecting, IsAlive, IsBlocking, IsPlayer
+from game.occupancy import set_blocking
+from game.scheduler import sleep
+from game.tags import Affecting, IsAlive, IsPlayer
 
 logger = logging.getLogger(__name__)
 
 
+@attrs.define(eq=False)
+class CombatStats:
+    """Cached effective combat stats of an actor, removed when the stats or bonuses affecting the actor change."""
+
+    attack: int | None = None
+    defense: int | None = None
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the stats when pickled, unset stats are computed again when read."""
+        return (self.__class__, ())
+
+
+def _get_stats(actor: tcod.ecs.Entity) -> CombatStats:
+    """Return the cached combat stats of an actor."""
+    stats = actor.components.get(CombatStats)
+    if stats is None:
+        stats = actor.components[CombatStats] = CombatStats()
+    return stats
+
+
+def invalidate_combat_stats(actor: tcod.ecs.Entity) -> None:
+    """Discard the cached combat stats of an actor, this must be called after an Affecting relation is changed."""
+    actor.components.pop(CombatStats, None)
+
+
 def get_attack(actor: tcod.ecs.Entity) -> int:
     """Get an entities attack power."""
-    attack_power = actor.components.get(Power, 0)
-    for e in actor.registry.Q.all_of(components=[PowerBonus], relations=[(Affecting, actor)]):
-        attack_power += e.components[PowerBonus]
-    return attack_power
+    stats = _get_stats(actor)
+    if stats.attack is None:
+        stats.attack = actor.components.get(Power, 0)
+        for e in actor.registry.Q.all_of(components=[PowerBonus], relations=[(Affecting, actor)]):
+            stats.attack += e.components[PowerBonus]
+    return stats.attack
 
 
 def get_defense(actor: tcod.ecs.Entity) -> int:
     """Get an entities defense power."""
-    defense_power = actor.components.get(Defense, 0)
-    for e in actor.registry.Q.all_of(components=[DefenseBonus], relations=[(Affecting, actor)]):
-        defense_power += e.components[DefenseBonus]
-    return defense_power
+    stats = _get_stats(actor)
+    if stats.defense is None:
+        stats.defense = actor.components.get(Defense, 0)
+        for e in actor.registry.Q.all_of(components=[DefenseBonus], relations=[(Affecting, actor)]):
+            stats.defense += e.components[DefenseBonus]
+    return stats.defense
+
+
+@tcod.ecs.callbacks.register_component_changed(component=Power)
+@tcod.ecs.callbacks.register_component_changed(component=Defense)
+def on_base_stat_changed(entity: tcod.ecs.Entity, old: int | None, new: int | None) -> None:
+    """Discard the cached combat stats of an actor when its base stats change, such as on level up."""
+    if old != new:
+        invalidate_combat_stats(entity)
+
+
+@tcod.ecs.callbacks.register_component_changed(component=PowerBonus)
+@tcod.ecs.callbacks.register_component_changed(component=DefenseBonus)
+def on_bonus_changed(entity: tcod.ecs.Entity, old: int | None, new: int | None) -> None:
+    """Discard the cached combat stats of the actor affected by an entity when its bonuses change."""
+    if old == new:
+        return
+    target = entity.relation_tag.get(Affecting)
+    if target is not None:
+        invalidate_combat_stats(target)
 
 
 def melee_damage(attacker: tcod.ecs.Entity, target: tcod.ecs.Entity) -> int:
@@ -59,7 +113,9 @@ def die(entity: tcod.ecs.Entity, blame: tcod.ecs.Entity | None) -> None:
     entity.components[Graphic] = Graphic(ord("%"), (191, 0, 0))
     entity.components[Name] = f"remains of {entity.components[Name]}"
     entity.components.pop(AI, None)
-    entity.tags.discard(IsBlocking)
+    sleep(entity)
+    unpark(entity)
+    set_blocking(entity, False)
     entity.tags.discard(IsAlive)
 
 
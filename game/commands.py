@@ -0,0 +1,70 @@
+"""Deferred changes to entities."""
+
+from __future__ import annotations
+
+import contextlib
+from collections.abc import Iterator
+from typing import Any, Self, TypeVar
+
+import attrs
+import tcod.ecs  # noqa: TC002
+from tcod.ecs.typing import ComponentKey  # noqa: TC002
+
+_T = TypeVar("_T")
+
+
+@attrs.define(eq=False)
+class CommandBuffer:
+    """Component changes which are applied together when the buffer is flushed.
+
+    Repeated writes to the same component of an entity are coalesced, only the last one is applied.
+    Changes are applied in the order each component was first written.
+    """
+
+    components: dict[tuple[tcod.ecs.Entity, ComponentKey[Any]], object] = attrs.field(factory=dict)
+    """Pending component values."""
+
+    def flush(self) -> None:
+        """Apply and forget the pending changes."""
+        components, self.components = self.components, {}
+        for (entity, key), value in components.items():
+            entity.components[key] = value
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard pending changes when pickled, the buffer only exists within `defer_changes`."""
+        return (self.__class__, ())
+
+
+@contextlib.contextmanager
+def defer_changes(world: tcod.ecs.Registry) -> Iterator[CommandBuffer]:
+    """Buffer the changes made with `set_component` within this context.
+
+    The buffer is flushed when the outermost context exits normally, changes are dropped if an exception is raised.
+    """
+    buffer = world[None].components.get(CommandBuffer)
+    if buffer is not None:
+        yield buffer  # Already deferring, the outer context will flush.
+        return
+    buffer = world[None].components[CommandBuffer] = CommandBuffer()
+    try:
+        yield buffer
+    finally:
+        del world[None].components[CommandBuffer]
+    buffer.flush()
+
+
+def get_component(entity: tcod.ecs.Entity, key: ComponentKey[_T]) -> _T:
+    """Return a component of an entity, including changes not yet flushed."""
+    buffer = entity.registry[None].components.get(CommandBuffer)
+    if buffer is not None and (entity, key) in buffer.components:
+        return buffer.components[entity, key]  # type: ignore[return-value]
+    return entity.components[key]
+
+
+def set_component(entity: tcod.ecs.Entity, key: ComponentKey[_T], value: _T) -> None:
+    """Assign a component of an entity, deferred if within `defer_changes`."""
+    buffer = entity.registry[None].components.get(CommandBuffer)
+    if buffer is None:
+        entity.components[key] = value
+    else:
+        buffer.components[entity, key] = value
@@ -38,7 +38,7 @@ def ij(self) -> tuple[int, int]:
     def distance_squared(self, other: Position) -> int:
         """Return the squared distance between two positions."""
         assert self.map == other.map
-        return (self.x - other.x) ** 2 + (self.y - other.y) ** 1
+        return (self.x - other.x) ** 2 + (self.y - other.y) ** 2
 
 
 @attrs.define(frozen=True)
@@ -56,6 +56,14 @@ class MapShape(NamedTuple):
     width: int
 
 
+class FOVSource(NamedTuple):
+    """The parameters the current VisibleTiles of a map were computed from."""
+
+    pov_ij: tuple[int, int]
+    radius: int
+    tiles_version: int
+
+
 Tiles: Final = ("Tiles", NDArray[np.int8])
 """The tile indexes of a map entity."""
 
@@ -65,6 +73,27 @@ class MapShape(NamedTuple):
 MemoryTiles: Final = ("MemoryTiles", NDArray[np.int8])
 """Last seen tiles for a map."""
 
+GhostGlyphs: Final = ("GhostGlyphs", NDArray[np.int32])
+"""Glyphs of entities last seen on a map, zero where nothing is remembered."""
+
+GhostColors: Final = ("GhostColors", NDArray[np.uint8])
+"""Colors of entities last seen on a map, in the shape `(height, width, 3)`."""
+
+GhostNames: Final = ("GhostNames", NDArray[np.int32])
+"""Names of entities last seen on a map, as indexes of `GhostNameTable`."""
+
+GhostNameTable: Final = ("GhostNameTable", list[str])
+"""Unique names used by `GhostNames`, the first name is always blank."""
+
+GhostNameIds: Final = ("GhostNameIds", dict[str, int])
+"""The index of each name in `GhostNameTable`."""
+
+TilesVersion: Final = ("TilesVersion", int)
+"""Incremented whenever the Tiles of a map change, used to invalidate cached data."""
+
+MemoryVersion: Final = ("MemoryVersion", int)
+"""Incremented whenever the MemoryTiles of a map change, used to invalidate cached data."""
+
 Name: Final = ("Name", str)
 """Name of an entity."""
 
@@ -83,6 +112,27 @@ class MapShape(NamedTuple):
 AI: Final = ("AI", Action)
 """Action for AI actor."""
 
+SightRadius: Final = ("SightRadius", int)
+"""How far an actor can see."""
+
+Speed: Final = ("Speed", int)
+"""How fast an actor acts, actors without this component use `DEFAULT_SPEED`."""
+
+NextActTime: Final = ("NextActTime", int)
+"""The game time when an actor will take its next turn, actors without this component are asleep."""
+
+GameTime: Final = ("GameTime", int)
+"""The current game time of the world."""
+
+LastActiveTime: Final = ("LastActiveTime", int)
+"""Game time at which the player last left a map, removed once the map catches up on the time it missed."""
+
+UseCrowdAI: Final = ("UseCrowdAI", bool)
+"""If True then hostile actors which can see the player take their turns together, see `game.crowd`."""
+
+AIWorkers: Final = ("AIWorkers", int)
+"""Number of worker processes used to plan crowd turns, crowds are planned in-process if this is zero or missing."""
+
 Floor: Final = ("Floor", int)
 """Dungeon floor."""
 
@@ -126,3 +176,17 @@ def on_position_changed(entity: tcod.ecs.Entity, old: Position | None, new: Posi
         entity.relation_tag[IsIn] = new.map
     else:
         del entity.relation_tags_many[IsIn]
+
+
+@tcod.ecs.callbacks.register_component_changed(component=Tiles)
+def on_tiles_changed(entity: tcod.ecs.Entity, old: NDArray[np.int8] | None, new: NDArray[np.int8] | None) -> None:
+    """Called when the tiles array of a map is replaced."""
+    if old is not new:
+        entity.components[TilesVersion] = entity.components.get(TilesVersion, 0) + 1
+
+
+@tcod.ecs.callbacks.register_component_changed(component=MemoryTiles)
+def on_memory_changed(entity: tcod.ecs.Entity, old: NDArray[np.int8] | None, new: NDArray[np.int8] | None) -> None:
+    """Called when the memory array of a map is replaced."""
+    if old is not new:
+        entity.components[MemoryVersion] = entity.components.get(MemoryVersion, 0) + 1
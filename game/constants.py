@@ -40,3 +40,30 @@
 }
 
 INVENTORY_KEYS = "abcdefghijklmnopqrstuvwxyz"
+
+DEFAULT_SIGHT_RADIUS: Final = 10
+"""Sight radius of actors without a SightRadius component."""
+
+DEFAULT_SPEED: Final = 100
+"""Speed of actors without a Speed component."""
+
+ACTION_COST: Final = 100
+"""Time taken by a normal action at the default speed."""
+
+WAKE_RADIUS: Final = 15
+"""Monsters further than this from the player go dormant without checking if they can see the player."""
+
+DORMANT_COST: Final = 10 * ACTION_COST
+"""Time a dormant monster waits before checking on the player again, unless roused sooner."""
+
+MELEE_NOISE_RADIUS: Final = 8
+"""Dormant monsters within this distance of a melee attack are roused by it."""
+
+CATCH_UP_HEAL_TURNS: Final = 10
+"""Turns it takes a monster on a map the player has left to regain 1 HP."""
+
+CATCH_UP_REGROUP_TURNS: Final = 100
+"""Monsters on a map the player has left for this many turns regroup with other monsters."""
+
+CATCH_UP_MAX_WANDER: Final = 16
+"""Furthest a monster wanders from where it was left, the distance otherwise grows with the square root of the time."""
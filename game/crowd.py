@@ -0,0 +1,167 @@
+"""Vectorized turns for crowds of hostile actors."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Final
+
+import numpy as np
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.actions import FollowPath, HostileAI, Melee
+from game.actor_table import get_actor_table
+from game.commands import defer_changes, get_component, set_component
+from game.components import AI, AIWorkers, Position, VisibleTiles
+from game.constants import WAKE_RADIUS
+from game.dormancy import unpark
+from game.occupancy import get_occupancy
+from game.perception import get_sight_radius
+from game.shared_pool import map_shared, share_array
+from game.tags import IsIn
+from game.travel import DIRECTIONS, get_distance_field
+
+PARALLEL_MIN_CROWD: Final = 1024
+"""Smallest crowd which has its steps ranked in the process pool, smaller crowds are faster to rank in-process."""
+
+PARALLEL_CHUNK_SIZE: Final = 512
+"""Number of actors ranked by each task sent to the process pool."""
+
+_DIRECTIONS_IJ: Final = np.array([(dy, dx) for dx, dy in DIRECTIONS], dtype=np.intp)
+"""DIRECTIONS as `(di, dj)` offsets."""
+
+
+def _get_steps(
+    positions: NDArray[np.intp], shape: tuple[int, ...]
+) -> tuple[NDArray[np.intp], NDArray[np.intp], NDArray[np.bool]]:
+    """Return the `(i, j, in_bounds)` indexes of the tiles in every direction from `positions`.
+
+    Out of bounds indexes are clamped to zero.
+    """
+    steps = positions[:, np.newaxis, :] + _DIRECTIONS_IJ[np.newaxis, :, :]  # (actor, direction, ij)
+    in_bounds = (steps[..., 0] >= 0) & (steps[..., 0] < shape[0]) & (steps[..., 1] >= 0) & (steps[..., 1] < shape[1])
+    return np.where(in_bounds, steps[..., 0], 0), np.where(in_bounds, steps[..., 1], 0), in_bounds
+
+
+def rank_steps(
+    field: NDArray[np.int32], occupied: NDArray[np.bool], positions: NDArray[np.intp], chasing: NDArray[np.bool]
+) -> tuple[NDArray[np.int32], NDArray[np.intp]]:
+    """Return the `(step_cost, choices)` of the actors at `positions` moving down `field`.
+
+    `step_cost` is the field value of each direction from each actor,
+    set to the maximum value for directions which are not downhill, are occupied, or for actors which are not `chasing`.
+    `choices` are the directions of each actor from best to worst.
+
+    This only reads its arguments and is safe to run in a worker process.
+    """
+    unreachable = np.iinfo(field.dtype).max
+    steps_i, steps_j, in_bounds = _get_steps(positions, field.shape)
+    step_cost = np.where(in_bounds & ~occupied[steps_i, steps_j], field[steps_i, steps_j], unreachable)
+    here = field[positions[:, 0], positions[:, 1]]
+    step_cost[(step_cost >= here[:, np.newaxis]) | ~chasing[:, np.newaxis]] = unreachable
+    return step_cost, np.argsort(step_cost, axis=1, kind="stable")
+
+
+def _rank_crowd_steps(
+    map_: tcod.ecs.Entity,
+    field: NDArray[np.int32],
+    occupied: NDArray[np.bool],
+    positions: NDArray[np.intp],
+    chasing: NDArray[np.bool],
+) -> tuple[NDArray[np.int32], NDArray[np.intp]]:
+    """Return `rank_steps` for a crowd, computed by the process pool for large crowds if the world has AIWorkers."""
+    workers: Final = map_.registry[None].components.get(AIWorkers, 0)
+    if workers <= 0 or len(positions) < PARALLEL_MIN_CROWD:
+        return rank_steps(field, occupied, positions, chasing)
+    refs: Final = share_array(map_, "field", field), share_array(map_, "occupied", occupied)
+    chunks: Final = [
+        (positions[i : i + PARALLEL_CHUNK_SIZE], chasing[i : i + PARALLEL_CHUNK_SIZE])
+        for i in range(0, len(positions), PARALLEL_CHUNK_SIZE)
+    ]
+    results: Final = map_shared(rank_steps, refs, chunks, workers)
+    return np.concatenate([result[0] for result in results]), np.concatenate([result[1] for result in results])
+
+
+def _resolve_steps(
+    field: NDArray[np.int32],
+    occupied: NDArray[np.bool],
+    positions: NDArray[np.intp],
+    step_cost: NDArray[np.int32],
+    choices: NDArray[np.intp],
+) -> NDArray[np.intp]:
+    """Return the direction index each actor will step in, or -1 for actors which will not move.
+
+    Actors closest to the bottom of `field` claim their steps first, `occupied` is updated with the claimed tiles.
+    """
+    steps_i, steps_j, _ = _get_steps(positions, field.shape)
+    unreachable: Final = np.iinfo(field.dtype).max
+    width: Final = field.shape[1]
+    priority: Final = np.argsort(field[positions[:, 0], positions[:, 1]], kind="stable")
+    chosen: Final = np.full(len(positions), -1, dtype=np.intp)
+    for rank in range(len(DIRECTIONS)):
+        direction = choices[priority, rank]
+        is_pending = (chosen[priority] == -1) & (step_cost[priority, direction] != unreachable)
+        if not is_pending.any():
+            break
+        pending, direction = priority[is_pending], direction[is_pending]  # Actors without a step yet, in order.
+        claim_i, claim_j = steps_i[pending, direction], steps_j[pending, direction]
+        free = ~occupied[claim_i, claim_j]
+        pending, direction, claim_i, claim_j = pending[free], direction[free], claim_i[free], claim_j[free]
+        _, first = np.unique(claim_i * width + claim_j, return_index=True)  # First claim of each tile wins.
+        chosen[pending[first]] = direction[first]
+        occupied[claim_i[first], claim_j[first]] = True
+    return chosen
+
+
+def take_crowd_turns(actors: Sequence[tcod.ecs.Entity], target: tcod.ecs.Entity) -> list[tcod.ecs.Entity]:
+    """Take the turns of the HostileAI `actors` which can see `target` in one vectorized pass.
+
+    Actors next to the target attack it, the others take one step down the shared distance field towards it.
+    Steps are claimed in order of distance to the target, an actor whose every downhill step is taken waits instead.
+    Tiles vacated by other actors this turn are not reused.
+
+    Visibility is taken from the target's own view, so this assumes actors see as far as the target does.
+
+    If the world has AIWorkers then the steps of large crowds are ranked in a process pool.
+
+    Returns the actors which can not see the target, their turns must be taken individually.
+    """
+    if not actors:
+        return []
+    map_: Final = target.relation_tag[IsIn]
+    target_pos: Final = target.components[Position]
+    table: Final = get_actor_table(map_)
+    rows: Final = np.array([table.rows[actor] for actor in actors], dtype=np.intp)
+    positions: Final = np.stack((table["y"][rows], table["x"][rows]), axis=1).astype(np.intp)
+    radius: Final = np.array([min(get_sight_radius(actor), WAKE_RADIUS) for actor in actors])
+    delta: Final = np.asarray(target_pos.ij) - positions
+    distance: Final = np.abs(delta).max(axis=1)  # Chebyshev distance.
+    sees_target: Final = (distance <= radius) & map_.components[VisibleTiles][positions[:, 0], positions[:, 1]]
+    adjacent: Final = sees_target & (distance <= 1)
+    chasing: Final = sees_target & (distance > 1)
+
+    field: Final = get_distance_field(target_pos)
+    occupied: Final = get_occupancy(map_).blockers > 0
+    step_cost, choices = _rank_crowd_steps(map_, field, occupied, positions, chasing)
+    chosen: Final = _resolve_steps(field, occupied, positions, step_cost, choices)
+
+    # Commit the decisions, steps were already resolved against each other so they are applied together afterwards
+    remaining: list[tcod.ecs.Entity] = []
+    with defer_changes(map_.registry):
+        for actor, attacks, chases, step in zip(
+            actors, adjacent.tolist(), chasing.tolist(), chosen.tolist(), strict=True
+        ):
+            if not (attacks or chases):
+                remaining.append(actor)
+                continue
+            unpark(actor)
+            ai = actor.components[AI]
+            assert isinstance(ai, HostileAI)
+            ai.path = FollowPath()
+            ai.last_seen = target_pos
+            if attacks:
+                actor_pos = actor.components[Position]
+                Melee((target_pos.x - actor_pos.x, target_pos.y - actor_pos.y))(actor)
+            elif step != -1:
+                set_component(actor, Position, get_component(actor, Position) + DIRECTIONS[step])
+    return remaining
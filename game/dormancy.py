@@ -0,0 +1,129 @@
+"""Tools for parking inactive monsters."""
+
+from __future__ import annotations
+
+from typing import Final, Self
+
+import attrs
+import numpy as np  # noqa: TC002
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.action import Success
+from game.components import Position
+from game.constants import DORMANT_COST
+from game.occupancy import in_mask
+from game.scheduler import get_time, schedule_turn
+from game.tags import IsDormant, IsIn
+from game.travel import RoomGraph
+
+NOISE_BLOCK_SIZE: Final = 16
+"""Size of the square blocks of tiles dormant actors are grouped by when looking for actors within earshot."""
+
+
+@attrs.define(eq=False)
+class DormantIndex:
+    """Cached index of the dormant actors of a map."""
+
+    rooms: dict[int, set[tcod.ecs.Entity]] = attrs.field(factory=dict)
+    """Dormant actors by the room they are in, -1 for actors outside of any room."""
+    blocks: dict[tuple[int, int], set[tcod.ecs.Entity]] = attrs.field(factory=dict)
+    """Dormant actors by the `NOISE_BLOCK_SIZE` block of tiles they are in."""
+    built: bool = False
+    """False until the index is filled by `_get_index`, an unpickled index is empty and must be rebuilt."""
+
+    def add(self, actor: tcod.ecs.Entity) -> None:
+        """Add a dormant actor to the index."""
+        pos = actor.components[Position]
+        self.rooms.setdefault(_get_room(pos), set()).add(actor)
+        self.blocks.setdefault(_get_block(pos), set()).add(actor)
+
+    def discard(self, actor: tcod.ecs.Entity) -> None:
+        """Remove an actor from the index."""
+        pos = actor.components[Position]
+        self.rooms.get(_get_room(pos), set()).discard(actor)
+        self.blocks.get(_get_block(pos), set()).discard(actor)
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the index when pickled, it is marked as unbuilt so that `_get_index` rebuilds it."""
+        return (self.__class__, ())
+
+
+def _get_room(pos: Position) -> int:
+    """Return the room index of a position, or -1 if the map has no room graph or `pos` is outside of any room."""
+    room_graph = pos.map.components.get(RoomGraph)
+    if room_graph is None:
+        return -1
+    return int(room_graph.regions[pos.ij])
+
+
+def _get_block(pos: Position) -> tuple[int, int]:
+    """Return the noise block of a position."""
+    return pos.y // NOISE_BLOCK_SIZE, pos.x // NOISE_BLOCK_SIZE
+
+
+def _get_index(map_: tcod.ecs.Entity) -> DormantIndex:
+    """Return the dormant index of a map, building it from the IsDormant actors of the map if it is not cached."""
+    index = map_.components.get(DormantIndex)
+    if index is None or not index.built:
+        index = map_.components[DormantIndex] = DormantIndex(built=True)
+        for actor in map_.registry.Q.all_of(components=[Position], tags=[IsDormant], relations=[(IsIn, map_)]):
+            index.add(actor)
+    return index
+
+
+def park(actor: tcod.ecs.Entity, duration: int = DORMANT_COST) -> Success:
+    """Make an actor dormant and return the result of its turn.
+
+    The actor skips its turns until it is roused or `duration` has passed.
+    """
+    if IsDormant not in actor.tags:
+        index = _get_index(actor.relation_tag[IsIn])
+        actor.tags.add(IsDormant)
+        index.add(actor)
+    return Success(cost=duration)
+
+
+def unpark(actor: tcod.ecs.Entity) -> None:
+    """Make a dormant actor active again without changing when its next turn is."""
+    if IsDormant not in actor.tags:
+        return
+    actor.tags.discard(IsDormant)
+    index = actor.relation_tag[IsIn].components.get(DormantIndex)
+    if index is not None and index.built:
+        index.discard(actor)
+
+
+def rouse(actor: tcod.ecs.Entity) -> None:
+    """Make a dormant actor active and have it act as soon as possible."""
+    if IsDormant not in actor.tags:
+        return
+    unpark(actor)
+    schedule_turn(actor, get_time(actor.registry))
+
+
+def rouse_room(pos: Position) -> None:
+    """Rouse the dormant actors in the same room as `pos`."""
+    room = _get_room(pos)
+    if room == -1:
+        return  # Only actors in rooms are roused this way.
+    for actor in list(_get_index(pos.map).rooms.get(room, ())):
+        rouse(actor)
+
+
+def make_noise(pos: Position, radius: int) -> None:
+    """Rouse the dormant actors within `radius` of `pos`."""
+    index = _get_index(pos.map)
+    for block_i in range((pos.y - radius) // NOISE_BLOCK_SIZE, (pos.y + radius) // NOISE_BLOCK_SIZE + 1):
+        for block_j in range((pos.x - radius) // NOISE_BLOCK_SIZE, (pos.x + radius) // NOISE_BLOCK_SIZE + 1):
+            for actor in list(index.blocks.get((block_i, block_j), ())):
+                actor_pos = actor.components[Position]
+                if max(abs(actor_pos.x - pos.x), abs(actor_pos.y - pos.y)) <= radius:
+                    rouse(actor)
+
+
+def rouse_seen(map_: tcod.ecs.Entity, visible: NDArray[np.bool], area: tuple[slice, ...]) -> None:
+    """Rouse the dormant actors on the True tiles of `visible`, which covers `area` of a map."""
+    for actor in in_mask(map_, visible, area=area):
+        if IsDormant in actor.tags:
+            rouse(actor)
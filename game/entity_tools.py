@@ -5,7 +5,7 @@
 from tcod.ecs import Entity  # noqa: TC002
 
 from game.components import Count, Name
-from game.tags import EquippedBy
+from game.tags import EquippedBy, IsAlive, IsItem, IsPlayer
 
 
 def get_name(entity: Entity) -> str:
@@ -21,3 +21,14 @@ def get_desc(entity: Entity) -> str:
     if EquippedBy in entity.relation_tag:
         name += " (E)"
     return name
+
+
+def get_render_order(entity: Entity) -> int:
+    """Return the render priority of an entity, entities with a higher priority are drawn over others."""
+    if IsPlayer in entity.tags:
+        return 4
+    if IsAlive in entity.tags:
+        return 3
+    if IsItem in entity.tags:
+        return 2
+    return 1
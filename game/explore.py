@@ -0,0 +1,102 @@
+"""Exploration tools."""
+
+from __future__ import annotations
+
+from typing import Self
+
+import attrs
+import numpy as np
+import tcod.ecs
+import tcod.path
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.components import MapShape, MemoryTiles, Position
+from game.tiles import TILES
+
+
+@attrs.define(eq=False)
+class Frontier:
+    """Cached frontier of the explored area of a map and the walking distance to it."""
+
+    mask: NDArray[np.bool] = attrs.field(factory=lambda: np.zeros((0, 0), dtype=np.bool))
+    """Remembered walkable tiles which are next to an unexplored tile."""
+    distance: NDArray[np.int32] | None = None
+    """Walking distance over remembered tiles to the nearest frontier tile, None if it must be recomputed."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the frontier when pickled, its empty mask makes `_get_frontier` compute it again."""
+        return (self.__class__, ())
+
+
+def _compute_frontier(memory: NDArray[np.int8]) -> NDArray[np.bool]:
+    """Return the frontier of the inner area of `memory`, the outer edge of `memory` is only used as neighbors."""
+    unexplored = memory == 0
+    next_to_unexplored = np.zeros((memory.shape[0] - 2, memory.shape[1] - 2), dtype=np.bool)
+    for i in range(3):
+        for j in range(3):
+            next_to_unexplored |= unexplored[i : i + next_to_unexplored.shape[0], j : j + next_to_unexplored.shape[1]]
+    return next_to_unexplored & (TILES["walk_cost"][memory[1:-1, 1:-1]] > 0)
+
+
+def _get_frontier(map_: tcod.ecs.Entity) -> Frontier:
+    """Return the frontier of a map, computing it if it is not cached."""
+    frontier = map_.components.get(Frontier)
+    if frontier is None or frontier.mask.shape != map_.components[MapShape]:
+        memory = np.pad(map_.components[MemoryTiles], 1, constant_values=-1)  # Outside of the map counts as explored.
+        frontier = Frontier(mask=_compute_frontier(memory))
+        map_.components[Frontier] = frontier
+    return frontier
+
+
+def update_frontier(map_: tcod.ecs.Entity, area: tuple[slice, ...]) -> None:
+    """Update the cached frontier of a map after the memory within `area` has changed.
+
+    Only the changed area and the tiles next to it are checked.
+    The distance to the frontier is recomputed later only if the frontier has actually changed.
+    """
+    frontier = map_.components.get(Frontier)
+    if frontier is None or frontier.mask.shape != map_.components[MapShape]:
+        return  # Nothing cached yet.
+    height, width = frontier.mask.shape
+    i_start, i_stop, _ = area[0].indices(height)
+    j_start, j_stop, _ = area[1].indices(width)
+    i_start, i_stop = max(0, i_start - 1), min(height, i_stop + 1)
+    j_start, j_stop = max(0, j_start - 1), min(width, j_stop + 1)
+    memory = map_.components[MemoryTiles][max(0, i_start - 1) : i_stop + 1, max(0, j_start - 1) : j_stop + 1]
+    pad_width = ((int(i_start == 0), int(i_stop == height)), (int(j_start == 0), int(j_stop == width)))
+    new_mask = _compute_frontier(
+        np.pad(memory, pad_width, constant_values=-1)
+    )  # Outside of the map counts as explored.
+    old_mask = frontier.mask[i_start:i_stop, j_start:j_stop]
+    if not np.array_equal(old_mask, new_mask):
+        old_mask[:] = new_mask
+        frontier.distance = None
+
+
+def get_frontier_distance(map_: tcod.ecs.Entity) -> NDArray[np.int32]:
+    """Return the read-only walking distance to the nearest frontier tile of a map.
+
+    Unreachable tiles, or every tile if the map is fully explored, are set to the maximum value of the array.
+    """
+    frontier = _get_frontier(map_)
+    if frontier.distance is None:
+        distance = tcod.path.maxarray(frontier.mask.shape, dtype=np.int32)
+        distance[frontier.mask] = 0
+        walk_cost = TILES["walk_cost"][map_.components[MemoryTiles]]
+        tcod.path.dijkstra2d(distance, walk_cost, cardinal=2, diagonal=3, out=distance)
+        distance.flags.writeable = False
+        frontier.distance = distance
+    return frontier.distance
+
+
+def is_frontier(map_: tcod.ecs.Entity, ij: tuple[int, int]) -> bool:
+    """Return True if the tile at `ij` is remembered, walkable, and next to an unexplored tile."""
+    return bool(_get_frontier(map_).mask[ij])
+
+
+def is_known_walkable(pos: Position) -> bool:
+    """Return True if `pos` is within its map and is remembered as a walkable tile."""
+    height, width = pos.map.components[MapShape]
+    return (
+        0 <= pos.x < width and 0 <= pos.y < height and TILES["walk_cost"][pos.map.components[MemoryTiles][pos.ij]] > 0
+    )
@@ -3,10 +3,13 @@
 from __future__ import annotations
 
 import logging
+from typing import Self
 
+import attrs
 from tcod.ecs import Entity, IsA
 
 from game.action import ActionResult, Impossible, Success
+from game.combat import invalidate_combat_stats
 from game.components import AssignedKey, Count, EquipSlot, Name, Position
 from game.constants import INVENTORY_KEYS
 from game.entity_tools import get_name
@@ -23,41 +26,105 @@ def spawn_item(template: Entity, position: Position) -> Entity:
     return item
 
 
+@attrs.define(eq=False)
+class InventoryIndex:
+    """Cached index of the items held by an actor, kept in sync by the item tools."""
+
+    stacks: dict[tuple[str | None, Entity | None], Entity] = attrs.field(factory=dict)
+    """Held items by their stack identity, see `get_stack_identity`."""
+    keys: dict[str, Entity] = attrs.field(factory=dict)
+    """Held items by their AssignedKey."""
+    slots: dict[object, Entity] = attrs.field(factory=dict)
+    """Equipped items by their EquipSlot."""
+    built: bool = False
+    """False until the index is filled by `_get_index`, an unpickled index is empty and must be rebuilt."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the index when pickled, it is marked as unbuilt so that `_get_index` rebuilds it."""
+        return (self.__class__, ())
+
+
+def _get_index(actor: Entity) -> InventoryIndex:
+    """Return the inventory index of an actor, building it from the items it holds if it is not cached."""
+    index = actor.components.get(InventoryIndex)
+    if index is None or not index.built:
+        index = actor.components[InventoryIndex] = InventoryIndex(built=True)
+        for item in actor.registry.Q.all_of(tags=[IsItem], relations=[(IsIn, actor)]):
+            index.stacks.setdefault(get_stack_identity(item), item)
+            index.keys[item.components[AssignedKey]] = item
+        for item in actor.registry.Q.all_of(relations=[(EquippedBy, actor)]):
+            index.slots[item.components[EquipSlot]] = item
+    return index
+
+
+def get_stack_identity(entity: Entity, /) -> tuple[str | None, Entity | None]:
+    """Return the `(name, template)` of an entity, entities with the same identity can be stacked."""
+    return entity.components.get(Name), entity.relation_tag.get(IsA)
+
+
 def can_stack(entity: Entity, onto: Entity, /) -> bool:
     """Return True if two entities can be stacked."""
-    return bool(
-        entity.components.get(Name) == onto.components.get(Name)
-        and entity.relation_tag.get(IsA) is onto.relation_tag.get(IsA)
-    )
+    return get_stack_identity(entity) == get_stack_identity(onto)
 
 
 def equip_item(actor: Entity, item: Entity, /) -> ActionResult:
     """Equip an item on an actor."""
-    unequip_slot(actor, item.components[EquipSlot])
+    slot = item.components[EquipSlot]
+    identity = get_stack_identity(item)
+    unequip_slot(actor, slot)
     if not (result := add_to_inventory(actor, item)):
         return result
+    if item.relation_tag.get(IsIn) is not actor:
+        item = _get_index(actor).stacks[identity]  # Item was merged into a held stack.
     item.relation_tag[EquippedBy] = actor
     item.relation_tag[Affecting] = actor
+    invalidate_combat_stats(actor)
+    _get_index(actor).slots[slot] = item
     item.components.pop(Position, None)
     return Success()
 
 
 def unequip_slot(actor: Entity, slot: object, /) -> None:
     """Free an equipment slot on an actor."""
-    for e in actor.registry.Q.all_of(relations=[(EquippedBy, actor)]):
-        if e.components[EquipSlot] == slot:
-            unequip_item(e)
-            return
+    item = _get_index(actor).slots.get(slot)
+    if item is not None:
+        unequip_item(item)
 
 
 def unequip_item(item: Entity, /) -> None:
     """Unequip an item from its actor."""
-    if IsActor not in item.relation_tag[IsIn].tags:
+    actor = item.relation_tag[IsIn]
+    if IsActor not in actor.tags:
         logger.warning("%s not equipped by an actor!", item)
         return
 
-    item.relation_tag.pop(EquippedBy, None)
-    item.relation_tag.pop(Affecting, None)
+    if item.relation_tag.pop(EquippedBy, None) is not None:
+        slots = _get_index(actor).slots
+        if slots.get(item.components[EquipSlot]) is item:
+            del slots[item.components[EquipSlot]]
+    affected = item.relation_tag.pop(Affecting, None)
+    if affected is not None:
+        invalidate_combat_stats(affected)
+
+
+def remove_from_inventory(item: Entity, /) -> None:
+    """Remove an item from the inventory of the actor holding it, the item should be unequipped first."""
+    actor = item.relation_tag[IsIn]
+    index = _get_index(actor)
+    if index.stacks.get(get_stack_identity(item)) is item:
+        del index.stacks[get_stack_identity(item)]
+    if index.keys.get(item.components.get(AssignedKey, "")) is item:
+        del index.keys[item.components[AssignedKey]]
+    del item.relation_tag[IsIn]
+
+
+def delete_item(item: Entity, /) -> None:
+    """Delete an item, removing it from the inventory it is held in first."""
+    holder = item.relation_tag.get(IsIn)
+    if holder is not None and IsActor in holder.tags:
+        unequip_item(item)
+        remove_from_inventory(item)
+    item.clear()
 
 
 def consume_item(item: Entity) -> None:
@@ -65,16 +132,16 @@ def consume_item(item: Entity) -> None:
     item.components.setdefault(Count, 1)
     item.components[Count] -= 1
     if item.components[Count] <= 0:
-        item.clear()
+        delete_item(item)
 
 
 def add_to_inventory(actor: Entity, item: Entity) -> ActionResult:
     """Add an item to actors inventory."""
     if item.relation_tag.get(IsIn) is actor:
         return Success()  # Already in inventory.
-    for held_item in actor.registry.Q.all_of(tags=[IsItem], relations=[(IsIn, actor)]):
-        if not can_stack(item, held_item):
-            continue
+    index = _get_index(actor)
+    held_item = index.stacks.get(get_stack_identity(item))
+    if held_item is not None:
         held_item.components.setdefault(Count, 1)
         held_item.components[Count] += item.components.get(Count, 1)
         msg = f"You picked up the {get_name(item)}!"
@@ -87,13 +154,15 @@ def add_to_inventory(actor: Entity, item: Entity) -> ActionResult:
 
     item.components.pop(Position, None)
     item.relation_tag[IsIn] = actor
+    index.stacks[get_stack_identity(item)] = item
+    index.keys[item.components[AssignedKey]] = item
 
     return Success(f"You picked up the {get_name(item)}!")
 
 
 def get_inventory_keys(actor: Entity) -> dict[str, Entity]:
     """Return a {key: item} dict of an actors inventory."""
-    return {e.components[AssignedKey]: e for e in actor.registry.Q.all_of(tags=[IsItem], relations=[(IsIn, actor)])}
+    return dict(_get_index(actor).keys)
 
 
 def assign_item_key(actor: Entity, item: Entity) -> None:
@@ -101,7 +170,7 @@ def assign_item_key(actor: Entity, item: Entity) -> None:
 
     Should be called before adding the item to the inventory.
     """
-    inventory = get_inventory_keys(actor)
+    inventory = _get_index(actor).keys
     for key in INVENTORY_KEYS:
         if key in inventory:
             continue
@@ -13,10 +13,11 @@
 from game.components import Position, VisibleTiles
 from game.effect import Effect
 from game.entity_tools import get_name
-from game.item_tools import consume_item
+from game.item_tools import consume_item, delete_item
 from game.messages import add_message
+from game.occupancy import nearest
 from game.spell import AreaOfEffect, EntitySpell, PositionSpell
-from game.tags import IsActor, IsIn
+from game.tags import IsActor
 
 
 @attrs.define
@@ -41,16 +42,14 @@ class RandomTargetScroll:
     def on_apply(self, actor: Entity, item: Entity) -> ActionResult:
         """Cast items spell at nearest target in range."""
         actor_pos = actor.components[Position]
-        possible_targets = actor.registry.Q.all_of(
-            components=[Position], tags=[IsActor], relations=[(IsIn, actor_pos.map)]
-        ).get_entities() - {actor}
-
-        visible_map = actor_pos.map.components[VisibleTiles]
-        visible_targets = [entity for entity in possible_targets if visible_map[entity.components[Position].ij]]
-        if not visible_targets:
+        target = nearest(
+            actor_pos,
+            lambda entity: entity is not actor and IsActor in entity.tags,
+            mask=actor_pos.map.components[VisibleTiles],
+        )
+        if target is None:
             return Impossible("No target visible.")
 
-        target = min(visible_targets, key=lambda entity: actor_pos.distance_squared(entity.components[Position]))
         if actor_pos.distance_squared(target.components[Position]) > self.maximum_range**2:
             return Impossible("No target in range.")
 
@@ -84,5 +83,5 @@ def on_apply(self, actor: Entity, item: Entity, target: Position | None = None)
 
         result = item.components[PositionSpell].cast_at_position(actor, item, target)
         if result:
-            item.clear()
+            delete_item(item)
         return result
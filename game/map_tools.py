@@ -2,11 +2,47 @@
 
 from __future__ import annotations
 
+from typing import Any, Self
+
+import attrs
 import numpy as np
-import tcod.ecs  # noqa: TC002
+import tcod.camera
+import tcod.constants
+import tcod.ecs
+import tcod.map
+from numpy.typing import NDArray  # noqa: TC002
 
-from game.components import MapShape, MemoryTiles, Tiles, VisibleTiles
+from game.changes import note_tiles_changed
+from game.components import (
+    GhostColors,
+    GhostGlyphs,
+    GhostNameIds,
+    GhostNames,
+    GhostNameTable,
+    MapShape,
+    MemoryTiles,
+    Tiles,
+    TilesVersion,
+    VisibleTiles,
+)
 from game.map import MapKey  # noqa: TC001
+from game.tiles import TILES
+
+
+@attrs.define(eq=False)
+class TileLayers:
+    """Cached per-tile properties of a map derived from its Tiles and the TILES database."""
+
+    version: int = -1
+    """The TilesVersion these layers are for, once `dirty` areas are updated."""
+    layers: dict[str, NDArray[Any]] = attrs.field(factory=dict)
+    """Derived layers by TILES field name."""
+    dirty: list[tuple[slice, ...]] = attrs.field(factory=list)
+    """Areas of tiles changed since the layers were last updated."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the layers when pickled, the unset version makes `get_tile_layer` derive them again."""
+        return (self.__class__, ())
 
 
 def new_map(world: tcod.ecs.World, shape: tuple[int, int]) -> tcod.ecs.Entity:
@@ -16,6 +52,11 @@ def new_map(world: tcod.ecs.World, shape: tuple[int, int]) -> tcod.ecs.Entity:
     map_.components[Tiles] = np.zeros(shape, dtype=np.int8)
     map_.components[VisibleTiles] = np.zeros(shape, dtype=np.bool)
     map_.components[MemoryTiles] = np.zeros(shape, dtype=np.int8)
+    map_.components[GhostGlyphs] = np.zeros(shape, dtype=np.int32)
+    map_.components[GhostColors] = np.zeros((*shape, 3), dtype=np.uint8)
+    map_.components[GhostNames] = np.zeros(shape, dtype=np.int32)
+    map_.components[GhostNameTable] = [""]
+    map_.components[GhostNameIds] = {"": 0}
 
     return map_
 
@@ -29,3 +70,82 @@ def get_map(world: tcod.ecs.World, key: MapKey) -> tcod.ecs.Entity:
     map_ = key.generate(world)
     map_.tags.add(key)
     return map_
+
+
+def get_radius_slices(
+    shape: tuple[int, int], center_ij: tuple[int, int], radius: int
+) -> tuple[tuple[slice, ...], tuple[slice, ...]]:
+    """Return the `(window_slices, map_slices)` of a square area within `radius` of `center_ij`.
+
+    `window_slices` index an array of shape `(radius * 2 + 1, radius * 2 + 1)` centered on `center_ij`.
+    `map_slices` index the same area on a map of `shape`, both are clipped to the bounds of the map.
+    """
+    size = radius * 2 + 1
+    return tcod.camera.get_slices((size, size), shape, (center_ij[0] - radius, center_ij[1] - radius))
+
+
+def compute_fov_area(
+    map_: tcod.ecs.Entity, pov_ij: tuple[int, int], radius: int, *, memory: bool = False
+) -> tuple[tuple[slice, ...], tuple[slice, ...], NDArray[np.bool]]:
+    """Compute the FOV of a map only within `radius` of `pov_ij`.
+
+    If `memory` is True then the FOV is computed from the MemoryTiles of the map instead of its Tiles.
+
+    Returns `(window_slices, map_slices, visible)` as from :any:`get_radius_slices`.
+    `visible` is the shape of the area indexed by these slices.
+    """
+    window_slices, map_slices = get_radius_slices(map_.components[MapShape], pov_ij, radius)
+    transparency = (
+        TILES["transparent"][map_.components[MemoryTiles][map_slices]]
+        if memory
+        else get_tile_layer(map_, "transparent")[map_slices]
+    )
+    visible = tcod.map.compute_fov(
+        transparency,
+        pov=(pov_ij[0] - map_slices[0].start, pov_ij[1] - map_slices[1].start),
+        radius=radius,
+        algorithm=tcod.constants.FOV_SYMMETRIC_SHADOWCAST,
+    )
+    return window_slices, map_slices, visible
+
+
+def mark_tiles_changed(map_: tcod.ecs.Entity, area: tuple[slice, ...] | None = None) -> None:
+    """Mark the Tiles of a map as modified in-place.
+
+    This must be called after writing to the Tiles array of a map.
+    If `area` is given then only that area of the derived layers will be recomputed, otherwise all of them are.
+    """
+    old_version = map_.components.get(TilesVersion, 0)
+    map_.components[TilesVersion] = old_version + 1
+    note_tiles_changed(map_, area)
+    cache = map_.components.get(TileLayers)
+    if cache is None or cache.version != old_version:
+        return  # Cache is already out-of-date and will be fully recomputed.
+    if area is None:
+        map_.components.pop(TileLayers)
+        return
+    cache.version = old_version + 1
+    cache.dirty.append(area)
+
+
+def get_tile_layer(map_: tcod.ecs.Entity, name: str) -> NDArray[Any]:
+    """Return the read-only `TILES[name]` layer of a map, such as "transparent" or "walk_cost".
+
+    Layers are cached and are only recomputed for areas where the tiles have changed.
+    """
+    tiles = map_.components[Tiles]
+    version = map_.components.get(TilesVersion, 0)
+    cache = map_.components.get(TileLayers)
+    if cache is None or cache.version != version:
+        map_.components[TileLayers] = cache = TileLayers(version)
+    if cache.dirty:
+        for layer_name, layer in cache.layers.items():
+            layer.flags.writeable = True
+            for area in cache.dirty:
+                layer[area] = TILES[layer_name][tiles[area]]
+            layer.flags.writeable = False
+        cache.dirty.clear()
+    if name not in cache.layers:
+        cache.layers[name] = layer = TILES[name][tiles]
+        layer.flags.writeable = False
+    return cache.layers[name]
@@ -0,0 +1,208 @@
+"""Index of the entities on each tile of a map."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Final, Self
+
+import attrs
+import numpy as np
+import tcod.ecs
+import tcod.ecs.callbacks
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.components import MapShape, Position
+from game.map_tools import get_radius_slices
+from game.tags import IsBlocking, IsIn
+
+NEAREST_START_RADIUS: Final = 8
+"""Radius of the first area searched by `nearest`, the area is doubled until a match is found."""
+
+
+@attrs.define(eq=False)
+class Occupancy:
+    """Cached index of the entities on each tile of a map, kept in sync as entities move, block, or stop blocking.
+
+    Positions outside of the map, such as the look cursor over the interface, are not indexed.
+    """
+
+    blockers: NDArray[np.int16] = attrs.field(factory=lambda: np.zeros((0, 0), dtype=np.int16))
+    """Number of blocking entities on each tile."""
+    counts: NDArray[np.int16] = attrs.field(factory=lambda: np.zeros((0, 0), dtype=np.int16))
+    """Number of entities on each tile."""
+    entities: dict[tuple[int, int], list[tcod.ecs.Entity]] = attrs.field(factory=dict)
+    """Entities on each occupied `ij` tile, in the order they arrived."""
+    blockers_changed: set[tuple[int, int]] = attrs.field(factory=set)
+    """Tiles where `blockers` changed since the path costs were last updated, see `game.travel.get_path_graph`."""
+    built: bool = False
+    """False until the index is filled by `get_occupancy`, an unpickled index is empty and must be rebuilt."""
+
+    def contains(self, pos: Position) -> bool:
+        """Return True if `pos` is within the bounds of the map."""
+        height: int = self.counts.shape[0]
+        width: int = self.counts.shape[1]
+        return 0 <= pos.y < height and 0 <= pos.x < width
+
+    def add(self, entity: tcod.ecs.Entity, pos: Position) -> None:
+        """Add an entity at `pos`."""
+        if not self.contains(pos):
+            return
+        self.entities.setdefault(pos.ij, []).append(entity)
+        self.counts[pos.ij] += 1
+        if IsBlocking in entity.tags:
+            self.blockers[pos.ij] += 1
+            self.blockers_changed.add(pos.ij)
+
+    def remove(self, entity: tcod.ecs.Entity, pos: Position) -> None:
+        """Remove an entity from `pos`."""
+        if not self.contains(pos):
+            return
+        here = self.entities[pos.ij]
+        here.remove(entity)
+        if not here:
+            del self.entities[pos.ij]
+        self.counts[pos.ij] -= 1
+        if IsBlocking in entity.tags:
+            self.blockers[pos.ij] -= 1
+            self.blockers_changed.add(pos.ij)
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the index when pickled, it is marked as unbuilt so that `get_occupancy` rebuilds it."""
+        return (self.__class__, ())
+
+
+def _get_built(map_: tcod.ecs.Entity) -> Occupancy | None:
+    """Return the occupancy index of a map if it is built and up to date, otherwise it is rebuilt when next used."""
+    occupancy = map_.components.get(Occupancy)
+    if occupancy is None or not occupancy.built or occupancy.counts.shape != map_.components[MapShape]:
+        return None
+    return occupancy
+
+
+def get_occupancy(map_: tcod.ecs.Entity) -> Occupancy:
+    """Return the occupancy index of a map.
+
+    Entities are only scanned once, after which they are tracked as they move, block, or stop blocking.
+    """
+    occupancy = _get_built(map_)
+    if occupancy is None:
+        shape = map_.components[MapShape]
+        occupancy = Occupancy(
+            blockers=np.zeros(shape, dtype=np.int16), counts=np.zeros(shape, dtype=np.int16), built=True
+        )
+        for entity in map_.registry.Q.all_of(components=[Position], relations=[(IsIn, map_)]):
+            occupancy.add(entity, entity.components[Position])
+        map_.components[Occupancy] = occupancy
+    return occupancy
+
+
+@tcod.ecs.callbacks.register_component_changed(component=Position)
+def on_occupancy_moved(entity: tcod.ecs.Entity, old: Position | None, new: Position | None) -> None:
+    """Track entities as they move."""
+    if old == new:
+        return
+    if old is not None and (occupancy := _get_built(old.map)) is not None:
+        occupancy.remove(entity, old)
+    if new is not None and (occupancy := _get_built(new.map)) is not None:
+        occupancy.add(entity, new)
+
+
+def set_blocking(entity: tcod.ecs.Entity, blocking: bool) -> None:  # noqa: FBT001
+    """Add or remove the IsBlocking tag of an entity."""
+    if (IsBlocking in entity.tags) == blocking:
+        return
+    if blocking:
+        entity.tags.add(IsBlocking)
+    else:
+        entity.tags.discard(IsBlocking)
+    pos = entity.components.get(Position)
+    if pos is None:
+        return
+    occupancy = _get_built(pos.map)
+    if occupancy is not None and occupancy.contains(pos):
+        occupancy.blockers[pos.ij] += 1 if blocking else -1
+        occupancy.blockers_changed.add(pos.ij)
+
+
+def get_entities_at(pos: Position) -> list[tcod.ecs.Entity]:
+    """Return the entities at `pos`, in the order they arrived."""
+    return list(get_occupancy(pos.map).entities.get(pos.ij, ()))
+
+
+def is_blocked(pos: Position) -> bool:
+    """Return True if a blocking entity is at `pos`, positions outside of the map are never blocked."""
+    occupancy = get_occupancy(pos.map)
+    return occupancy.contains(pos) and bool(occupancy.blockers.item(pos.ij) > 0)
+
+
+def _get_entities(occupancy: Occupancy, ii: NDArray[np.intp], jj: NDArray[np.intp]) -> list[tcod.ecs.Entity]:
+    """Return the entities on the occupied tiles at the indexes `ii, jj`, in order."""
+    return [entity for ij in zip(ii.tolist(), jj.tolist(), strict=True) for entity in occupancy.entities[ij]]
+
+
+def _get_occupied_near(
+    occupancy: Occupancy, center_ij: tuple[int, int], radius: int
+) -> tuple[NDArray[np.intp], NDArray[np.intp], NDArray[np.intp]]:
+    """Return the `(ii, jj, distance_squared)` of the occupied tiles within the square `radius` of `center_ij`."""
+    _, map_slices = get_radius_slices(occupancy.counts.shape, center_ij, radius)
+    ii, jj = np.nonzero(occupancy.counts[map_slices])
+    ii += map_slices[0].start
+    jj += map_slices[1].start
+    return ii, jj, (ii - center_ij[0]) ** 2 + (jj - center_ij[1]) ** 2
+
+
+def within_radius(pos: Position, radius: int) -> list[tcod.ecs.Entity]:
+    """Return the entities within the circular `radius` of `pos`, ordered by tile.
+
+    Only the occupied tiles within the square around `radius` are checked.
+    """
+    occupancy = get_occupancy(pos.map)
+    ii, jj, distance_squared = _get_occupied_near(occupancy, pos.ij, radius)
+    inside = distance_squared <= radius**2
+    return _get_entities(occupancy, ii[inside], jj[inside])
+
+
+def in_mask(
+    map_: tcod.ecs.Entity, mask: NDArray[np.bool], *, area: tuple[slice, ...] | None = None
+) -> list[tcod.ecs.Entity]:
+    """Return the entities on the True tiles of `mask`, ordered by tile.
+
+    `mask` is a boolean array the shape of the map, or the shape of `area` if an area of the map is given.
+    """
+    occupancy = get_occupancy(map_)
+    if area is None:
+        ii, jj = np.nonzero(mask & (occupancy.counts > 0))
+        return _get_entities(occupancy, ii, jj)
+    ii, jj = np.nonzero(mask & (occupancy.counts[area] > 0))
+    return _get_entities(occupancy, ii + (area[0].start or 0), jj + (area[1].start or 0))
+
+
+def nearest(
+    pos: Position,
+    predicate: Callable[[tcod.ecs.Entity], bool] | None = None,
+    *,
+    mask: NDArray[np.bool] | None = None,
+    max_radius: int | None = None,
+) -> tcod.ecs.Entity | None:
+    """Return the nearest entity to `pos` by straight distance, or None if there are no matches.
+
+    Only entities on the True tiles of `mask` and for which `predicate` returns True are matched.
+    The searched area starts at `NEAREST_START_RADIUS` and is doubled until an entity is found or `max_radius` is reached.
+    """
+    occupancy = get_occupancy(pos.map)
+    height, width = occupancy.counts.shape
+    limit = height + width if max_radius is None else max_radius
+    checked_squared = -1  # Entities within this squared distance were already checked.
+    radius = min(NEAREST_START_RADIUS, limit)
+    while True:
+        ii, jj, distance_squared = _get_occupied_near(occupancy, pos.ij, radius)
+        unchecked = (distance_squared > checked_squared) & (distance_squared <= radius**2)
+        if mask is not None:
+            unchecked &= mask[ii, jj]
+        order = np.argsort(distance_squared[unchecked], kind="stable")
+        for entity in _get_entities(occupancy, ii[unchecked][order], jj[unchecked][order]):
+            if predicate is None or predicate(entity):
+                return entity
+        if radius >= limit:
+            return None
+        checked_squared, radius = radius**2, min(radius * 2, limit)
@@ -0,0 +1,132 @@
+"""Downsampled map overview."""
+
+from __future__ import annotations
+
+from typing import Final, Self
+
+import attrs
+import numpy as np
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.components import MemoryTiles, VisibleTiles
+
+BLOCK_LEVELS: Final = 4
+"""Dirty areas are tracked in blocks of `2**BLOCK_LEVELS` tiles."""
+
+
+@attrs.define(eq=False)
+class Overview:
+    """Cached pyramid of block reduced memory and visibility layers for a map.
+
+    Level `n` of the pyramid covers `2**n` by `2**n` tiles per cell.
+    Level 0 is the map itself and is not stored here.
+    """
+
+    memory: list[NDArray[np.int8]] = attrs.field(factory=list)
+    """Reduced MemoryTiles for levels 1 and up, the highest tile index of each block is kept."""
+    visible: list[NDArray[np.bool]] = attrs.field(factory=list)
+    """Reduced VisibleTiles for levels 1 and up, True if any tile of a block is visible."""
+    dirty: NDArray[np.bool] | None = None
+    """Blocks which must be updated before the pyramid is used."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the pyramid when pickled, the unset `dirty` array makes `get_overview` rebuild it."""
+        return (self.__class__, ())
+
+
+def _reduce(array: NDArray[np.int8 | np.bool], i: slice, j: slice) -> NDArray[np.int8 | np.bool]:
+    """Return the 2x2 block reduction of `array` for the cells `i, j` of the next level."""
+    src = array[i.start * 2 : i.stop * 2, j.start * 2 : j.stop * 2]
+    height, width = src.shape
+    src = np.pad(src, ((0, height % 2), (0, width % 2)))
+    blocks = src.reshape(src.shape[0] // 2, 2, src.shape[1] // 2, 2)
+    return blocks.max(axis=(1, 3))  # type: ignore[no-any-return]
+
+
+def _update_levels(overview: Overview, map_: tcod.ecs.Entity, level: int, i: slice, j: slice) -> None:
+    """Update the cells `i, j` of `level` and every level below it, the slices are given in `level` cells."""
+    if level > 1:
+        _update_levels(overview, map_, level - 1, slice(i.start * 2, i.stop * 2), slice(j.start * 2, j.stop * 2))
+    src_memory = overview.memory[level - 2] if level > 1 else map_.components[MemoryTiles]
+    src_visible = overview.visible[level - 2] if level > 1 else map_.components[VisibleTiles]
+    dest_shape = overview.memory[level - 1].shape
+    i = slice(i.start, min(i.stop, dest_shape[0]))
+    j = slice(j.start, min(j.stop, dest_shape[1]))
+    overview.memory[level - 1][i, j] = _reduce(src_memory, i, j)
+    overview.visible[level - 1][i, j] = _reduce(src_visible, i, j)
+
+
+def _build(map_: tcod.ecs.Entity) -> Overview:
+    """Return a newly computed overview of a map."""
+    overview = Overview()
+    shape = map_.components[MemoryTiles].shape
+    while max(shape) > 1:
+        shape = (shape[0] + 1) // 2, (shape[1] + 1) // 2
+        overview.memory.append(np.zeros(shape, dtype=np.int8))
+        overview.visible.append(np.zeros(shape, dtype=np.bool))
+    if overview.memory:
+        top = len(overview.memory)
+        _update_levels(overview, map_, top, slice(0, 1), slice(0, 1))
+    block_shape = overview.memory[BLOCK_LEVELS - 1].shape if len(overview.memory) >= BLOCK_LEVELS else (1, 1)
+    overview.dirty = np.zeros(block_shape, dtype=np.bool)
+    map_.components[Overview] = overview
+    return overview
+
+
+def _update_levels_above(overview: Overview, level: int) -> None:
+    """Fully recompute every level above `level` from `level`."""
+    for upper in range(level + 1, len(overview.memory) + 1):
+        shape = overview.memory[upper - 1].shape
+        everything = slice(0, shape[0]), slice(0, shape[1])
+        overview.memory[upper - 1][:] = _reduce(overview.memory[upper - 2], *everything)
+        overview.visible[upper - 1][:] = _reduce(overview.visible[upper - 2], *everything)
+
+
+def mark_overview_dirty(map_: tcod.ecs.Entity, area: tuple[slice, ...]) -> None:
+    """Mark an area of tiles as changed, the overview of this area is updated the next time it is used."""
+    overview = map_.components.get(Overview)
+    if overview is None or overview.dirty is None:
+        return  # Nothing cached yet.
+    i, j = area
+    height, width = map_.components[MemoryTiles].shape
+    block_size = 2**BLOCK_LEVELS
+    i_start, i_stop, _ = i.indices(height)
+    j_start, j_stop, _ = j.indices(width)
+    if i_start >= i_stop or j_start >= j_stop:
+        return
+    overview.dirty[
+        i_start // block_size : (i_stop - 1) // block_size + 1, j_start // block_size : (j_stop - 1) // block_size + 1
+    ] = True
+
+
+def get_overview(map_: tcod.ecs.Entity, level: int) -> tuple[NDArray[np.int8], NDArray[np.bool]]:
+    """Return the `(memory, visible)` layers of a map reduced by `2**level`.
+
+    Only the blocks changed since the last call are updated.
+    """
+    if level == 0:
+        return map_.components[MemoryTiles], map_.components[VisibleTiles]
+    overview = map_.components.get(Overview)
+    if overview is None or overview.dirty is None:
+        overview = _build(map_)
+    assert overview.dirty is not None
+    block_level = min(BLOCK_LEVELS, len(overview.memory))
+    for block_i, block_j in np.argwhere(overview.dirty).tolist():
+        _update_levels(overview, map_, block_level, slice(block_i, block_i + 1), slice(block_j, block_j + 1))
+    if overview.dirty.any():
+        overview.dirty[:] = False
+        top = len(overview.memory)
+        if top > block_level:
+            _update_levels_above(overview, block_level)  # Higher levels are small, update them in full.
+    return overview.memory[level - 1], overview.visible[level - 1]
+
+
+def get_overview_level(map_shape: tuple[int, int], screen_shape: tuple[int, int]) -> int:
+    """Return the lowest overview level of a map which fits within `screen_shape`."""
+    level = 0
+    height, width = map_shape
+    while height > screen_shape[0] or width > screen_shape[1]:
+        level += 1
+        height, width = (height + 1) // 2, (width + 1) // 2
+    return level
@@ -0,0 +1,82 @@
+"""Actor perception."""
+
+from __future__ import annotations
+
+from typing import Final, Self
+
+import attrs
+import numpy as np  # noqa: TC002
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.components import Position, SightRadius, TilesVersion
+from game.constants import DEFAULT_SIGHT_RADIUS
+from game.map_tools import compute_fov_area
+from game.tags import IsIn
+
+FOV_CACHE_SIZE: Final = 1024
+"""Maximum number of FOV results cached per map."""
+
+
+@attrs.define(eq=False)
+class FOVCache:
+    """Cached FOV results of a map by `(pov_ij, radius)`."""
+
+    version: int = -1
+    """The TilesVersion of the cached results."""
+    results: dict[tuple[tuple[int, int], int], tuple[tuple[slice, ...], NDArray[np.bool]]] = attrs.field(factory=dict)
+    """Read-only `(map_slices, visible)` results, ordered from least to most recently used."""
+    hits: int = 0
+    """Number of lookups which returned a cached result."""
+    misses: int = 0
+    """Number of lookups which had to compute a new result."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the results when pickled, the unset version makes `get_fov` start over."""
+        return (self.__class__, ())
+
+
+def get_sight_radius(actor: tcod.ecs.Entity) -> int:
+    """Return how far an actor can see."""
+    return actor.components.get(SightRadius, DEFAULT_SIGHT_RADIUS)
+
+
+def get_fov(map_: tcod.ecs.Entity, pov_ij: tuple[int, int], radius: int) -> tuple[tuple[slice, ...], NDArray[np.bool]]:
+    """Return the FOV of a map from `pov_ij` as `(map_slices, visible)`.
+
+    `visible` covers the area of `map_slices` and must not be modified.
+    Results are cached until the tiles of the map change.
+    """
+    cache = map_.components.get(FOVCache)
+    if cache is None:
+        map_.components[FOVCache] = cache = FOVCache()
+    version = map_.components.get(TilesVersion, 0)
+    if cache.version != version:
+        cache.version = version
+        cache.results.clear()
+
+    key = pov_ij, radius
+    result = cache.results.pop(key, None)
+    if result is not None:
+        cache.hits += 1
+    else:
+        cache.misses += 1
+        _, map_slices, visible = compute_fov_area(map_, pov_ij, radius)
+        visible.flags.writeable = False
+        result = map_slices, visible
+        if len(cache.results) >= FOV_CACHE_SIZE:
+            del cache.results[next(iter(cache.results))]  # Discard the least recently used result.
+    cache.results[key] = result
+    return result
+
+
+def can_see(actor: tcod.ecs.Entity, target: Position) -> bool:
+    """Return True if `actor` can see the `target` position."""
+    actor_pos = actor.components[Position]
+    if actor.relation_tag[IsIn] is not target.map:
+        return False
+    radius = get_sight_radius(actor)
+    if max(abs(target.x - actor_pos.x), abs(target.y - actor_pos.y)) > radius:
+        return False
+    map_slices, visible = get_fov(target.map, actor_pos.ij, radius)
+    return bool(visible[target.y - map_slices[0].start, target.x - map_slices[1].start])
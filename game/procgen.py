@@ -20,8 +20,11 @@
 from game.components import AI, Floor, Graphic, Position, SpawnWeight, Tiles
 from game.item_tools import spawn_item
 from game.map import MapKey
+from game.occupancy import get_occupancy
+from game.scheduler import wake
 from game.tags import IsActor, IsItem
 from game.tiles import TILE_NAMES
+from game.travel import RoomGraph
 
 max_items_by_floor = (
     (1, 1),
@@ -119,13 +122,12 @@ def distance_to(self, other: RectangularRoom) -> int:
     def iter_random_spaces(self, rng: Random, map_: tcod.ecs.Entity) -> Iterator[Position]:
         """Iterate over floor spaces which do not already have an entity."""
         spaces = list(itertools.product(range(self.x1 + 1, self.x2 - 1), range(self.y1 + 1, self.y2 - 1)))
-        world = map_.registry
         rng.shuffle(spaces)
+        counts = get_occupancy(map_).counts
         for x, y in spaces:
-            pos = Position(x, y, map_)
-            if world.Q.all_of(tags=[pos]):
+            if counts[y, x]:
                 continue  # Space already taken.
-            yield pos
+            yield Position(x, y, map_)
 
 
 def random_walk_iter(rng: Random, start: tuple[int, int], space: tuple[int, int]) -> Iterator[tuple[int, int]]:
@@ -160,7 +162,7 @@ def tunnel_between_indices(
     return tuple(tunnel.T)  # type: ignore[return-value]
 
 
-def generate_dungeon(  # noqa: C901
+def generate_dungeon(  # noqa: C901, PLR0915
     *,
     world: tcod.ecs.World,
     shape: tuple[int, int],
@@ -183,6 +185,7 @@ def generate_dungeon(  # noqa: C901
     map_tiles = map_.components[Tiles]
     map_tiles[:] = TILE_NAMES["wall"]
     rng = world[None].components[Random]
+    room_graph = RoomGraph(regions=np.full(shape, -1, dtype=np.int16))
 
     room_width = rng.randint(room_min_size, room_max_size)
     room_height = rng.randint(room_min_size, room_max_size)
@@ -193,6 +196,7 @@ def generate_dungeon(  # noqa: C901
         )
     )
     map_tiles[rooms[-1].inner] = TILE_NAMES["floor"]
+    room_graph.add_room(rooms[-1].inner, rooms[-1].center_ij)
 
     for _ in range(max_rooms):
         from_room = rng.choice(rooms)
@@ -213,7 +217,10 @@ def generate_dungeon(  # noqa: C901
 
             nearest_room = min(rooms, key=new_room.distance_to)
             map_tiles[new_room.inner] = TILE_NAMES["floor"]
-            map_tiles[tunnel_between_indices(rng, nearest_room.center_ij, new_room.center_ij)] = TILE_NAMES["floor"]
+            tunnel = tunnel_between_indices(rng, nearest_room.center_ij, new_room.center_ij)
+            map_tiles[tunnel] = TILE_NAMES["floor"]
+            room_graph.add_room(new_room.inner, new_room.center_ij)
+            room_graph.add_tunnel(rooms.index(nearest_room), tunnel)
 
             rooms.append(new_room)
             break
@@ -221,7 +228,11 @@ def generate_dungeon(  # noqa: C901
     # Join random rooms
     for _ in range(2):
         room_a, room_b = rng.sample(rooms, 2)
-        map_tiles[tunnel_between_indices(rng, room_a.center_ij, room_b.center_ij)] = TILE_NAMES["floor"]
+        tunnel = tunnel_between_indices(rng, room_a.center_ij, room_b.center_ij)
+        map_tiles[tunnel] = TILE_NAMES["floor"]
+        room_graph.add_tunnel(rooms.index(room_a), tunnel)
+    game.map_tools.mark_tiles_changed(map_)
+    map_.components[RoomGraph] = room_graph
 
     up_stairs = world[object()]
     up_stairs.components[Position] = next(rooms[0].iter_random_spaces(rng, map_))
@@ -244,6 +255,7 @@ def generate_dungeon(  # noqa: C901
         ):
             new_monster = spawn_actor(monster_kind, pos)
             new_monster.components[AI] = HostileAI()
+            wake(new_monster)
 
         for item_kind, pos in zip(
             rng.choices(**item_weights, k=rng.randint(0, max_items_per_room)),
@@ -0,0 +1,107 @@
+"""Named queries which are reused between frames and turns."""
+
+from __future__ import annotations
+
+import functools
+from collections import Counter
+from collections.abc import Callable, Hashable
+from typing import Concatenate, ParamSpec, Self
+
+import attrs
+import tcod.ecs  # noqa: TC002
+from tcod.ecs.query import BoundQuery  # noqa: TC002
+
+from game.components import AI, Graphic, Position
+from game.tags import IsIn, IsItem, IsPlayer
+
+_P = ParamSpec("_P")
+
+_NAMES: set[str] = set()
+"""Names of the registered queries."""
+
+
+@attrs.define(eq=False)
+class QueryCache:
+    """Cached queries of a world by name and arguments, with counters of how often each was reused."""
+
+    queries: dict[tuple[str, tuple[Hashable, ...]], BoundQuery] = attrs.field(factory=dict)
+    hits: Counter[str] = attrs.field(factory=Counter)
+    """Number of times each named query was reused."""
+    misses: Counter[str] = attrs.field(factory=Counter)
+    """Number of times each named query had to be built."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the queries and counters when pickled, queries are built again on their next use."""
+        return (self.__class__, ())
+
+
+def _get_cache(world: tcod.ecs.Registry) -> QueryCache:
+    """Return the query cache of a world."""
+    cache = world[None].components.get(QueryCache)
+    if cache is None:
+        cache = world[None].components[QueryCache] = QueryCache()
+    return cache
+
+
+def named_query(
+    name: str,
+) -> Callable[
+    [Callable[Concatenate[tcod.ecs.Registry, _P], BoundQuery]], Callable[Concatenate[tcod.ecs.Registry, _P], BoundQuery]
+]:
+    """Register a function which builds a query from a world and hashable arguments, such as a map.
+
+    The decorated function only builds the query once per world and arguments, after which the same query is returned.
+    The entities matched by a reused query are cached by tcod-ecs,
+    which discards them when any of the components, tags, or relations of the query change.
+    """
+    assert name not in _NAMES, f"Query {name!r} is already registered."
+    _NAMES.add(name)
+
+    def decorator(
+        build: Callable[Concatenate[tcod.ecs.Registry, _P], BoundQuery],
+    ) -> Callable[Concatenate[tcod.ecs.Registry, _P], BoundQuery]:
+        @functools.wraps(build)
+        def get_query(world: tcod.ecs.Registry, *args: _P.args, **kwargs: _P.kwargs) -> BoundQuery:
+            cache = _get_cache(world)
+            key = name, (*args, *kwargs.items())
+            query = cache.queries.get(key)
+            if query is not None:
+                cache.hits[name] += 1
+                return query
+            cache.misses[name] += 1
+            query = cache.queries[key] = build(world, *args, **kwargs)
+            return query
+
+        return get_query
+
+    return decorator
+
+
+def get_query_stats(world: tcod.ecs.Registry) -> dict[str, tuple[int, int]]:
+    """Return the `(hits, misses)` of each named query used by a world."""
+    cache = _get_cache(world)
+    return {name: (cache.hits[name], cache.misses[name]) for name in sorted(cache.hits.keys() | cache.misses.keys())}
+
+
+@named_query("player")
+def player_query(world: tcod.ecs.Registry) -> BoundQuery:
+    """Query the player entity."""
+    return world.Q.all_of(tags=[IsPlayer])
+
+
+@named_query("actors_in")
+def actors_in_query(world: tcod.ecs.Registry, map_: tcod.ecs.Entity) -> BoundQuery:
+    """Query the actors with an AI on a map."""
+    return world.Q.all_of(components=[AI, Position], relations=[(IsIn, map_)])
+
+
+@named_query("items_in")
+def items_in_query(world: tcod.ecs.Registry, map_: tcod.ecs.Entity) -> BoundQuery:
+    """Query the items on the floor of a map."""
+    return world.Q.all_of(components=[Position], tags=[IsItem], relations=[(IsIn, map_)])
+
+
+@named_query("graphics_in")
+def graphics_in_query(world: tcod.ecs.Registry, map_: tcod.ecs.Entity) -> BoundQuery:
+    """Query the entities with a graphic on a map."""
+    return world.Q.all_of(components=[Position, Graphic], relations=[(IsIn, map_)])
@@ -12,9 +12,29 @@
 
 import g
 from game.actor_tools import get_player_actor, required_xp_for_level
-from game.components import HP, XP, Floor, Graphic, MapShape, MaxHP, MemoryTiles, Name, Position, Tiles, VisibleTiles
+from game.components import (
+    HP,
+    XP,
+    Floor,
+    GhostColors,
+    GhostGlyphs,
+    GhostNames,
+    GhostNameTable,
+    Graphic,
+    MapShape,
+    MaxHP,
+    MemoryTiles,
+    Name,
+    Position,
+    Tiles,
+    VisibleTiles,
+)
+from game.entity_tools import get_render_order
 from game.messages import Message, MessageLog
-from game.tags import IsAlive, IsGhost, IsIn, IsItem, IsPlayer
+from game.occupancy import get_entities_at
+from game.overview import get_overview, get_overview_level
+from game.queries import graphics_in_query
+from game.tags import IsIn
 from game.tiles import TILES
 
 from . import color
@@ -65,17 +85,14 @@ def render_names_at_position(console: tcod.console.Console, x: int, y: int, pos:
     map_height, map_width = pos.map.components[MapShape]
     if not (0 <= pos.x < map_width and 0 <= pos.y < map_height):
         return
-    is_visible = pos.map.components[VisibleTiles].item(pos.ij)
-    known_entities = [
-        entity
-        for entity in pos.map.registry.Q.all_of(components=[Name], tags=[pos])
-        if is_visible or (IsGhost in entity.tags)
-    ]
-    names = ", ".join(entity.components[Name] for entity in known_entities)
+    if pos.map.components[VisibleTiles].item(pos.ij):
+        names = ", ".join(entity.components[Name] for entity in get_entities_at(pos) if Name in entity.components)
+    else:
+        names = pos.map.components[GhostNameTable][pos.map.components[GhostNames].item(pos.ij)]
     console.print(x=x, y=y, string=names, fg=color.white)
 
 
-def main_render(  # noqa: C901
+def main_render(
     world: tcod.ecs.Registry, console: tcod.console.Console, *, highlight: NDArray[np.bool] | None = None
 ) -> None:
     """Main rendering code."""
@@ -93,20 +110,19 @@ def main_render(  # noqa: C901
 
     console.rgb[console_slices] = TILES["graphic"][np.where(visible, light_tiles, dark_tiles)]
 
+    ghost_glyphs = map_.components[GhostGlyphs][map_slices]
+    remembered = not_visible & (ghost_glyphs != 0)
+    console.rgb["ch"][console_slices][remembered] = ghost_glyphs[remembered]
+    console.rgb["fg"][console_slices][remembered] = map_.components[GhostColors][map_slices][remembered]
+
     rendered_priority: dict[Position, int] = {}
-    for entity in world.Q.all_of(components=[Position, Graphic], relations=[(IsIn, map_)]):
+    for entity in graphics_in_query(world, map_):
         pos = entity.components[Position]
         if not (0 <= pos.x < console.width and 0 <= pos.y < console.height):
             continue  # Out of bounds
-        if visible[pos.ij] == (IsGhost in entity.tags):
+        if not visible[pos.ij]:
             continue
-        render_order = 1
-        if IsItem in entity.tags:
-            render_order = 2
-        if IsAlive in entity.tags:
-            render_order = 3
-        if IsPlayer in entity.tags:
-            render_order = 4
+        render_order = get_render_order(entity)
         if rendered_priority.get(pos, 0) >= render_order:
             continue  # Do not render over a more important entity
         rendered_priority[pos] = render_order
@@ -151,3 +167,26 @@ def main_render(  # noqa: C901
     render_messages(world, width=40, height=5).blit(dest=console, dest_x=21, dest_y=45)
     if g.cursor_location:
         render_names_at_position(console, x=21, y=44, pos=Position(*g.cursor_location, map_))
+
+
+def render_overview(world: tcod.ecs.Registry, console: tcod.console.Console) -> None:
+    """Render the players map downsampled to fit the console."""
+    player = get_player_actor(world)
+    map_ = player.relation_tag[IsIn]
+    screen_shape = console.height - 1, console.width  # Top row is reserved for the title.
+    level = get_overview_level(map_.components[MapShape], screen_shape)
+    memory, visible = get_overview(map_, level)
+    console_slices, map_slices = tcod.camera.get_slices(screen_shape, memory.shape, (0, 0))
+    screen = console.rgb[1:]
+
+    screen[console_slices] = TILES["graphic"][memory[map_slices]]
+    not_visible = ~visible[map_slices]
+    screen["fg"][console_slices][not_visible] //= 2
+    screen["bg"][console_slices][not_visible] //= 2
+
+    player_pos = player.components[Position]
+    player_ij = player_pos.y >> level, player_pos.x >> level
+    if 0 <= player_ij[0] < screen.shape[0] and 0 <= player_ij[1] < screen.shape[1]:
+        screen[["ch", "fg"]][player_ij] = player.components[Graphic].ch, player.components[Graphic].fg
+
+    console.print(x=0, y=0, string=f" Overview 1:{2**level} - Dungeon level: {map_.components.get(Floor, '?')}")
@@ -0,0 +1,104 @@
+"""Turn scheduling tools."""
+
+from __future__ import annotations
+
+import heapq
+from collections.abc import Iterator
+from typing import Self
+
+import attrs
+import tcod.ecs  # noqa: TC002
+
+from game.components import AI, GameTime, NextActTime, Speed
+from game.constants import DEFAULT_SPEED
+from game.tags import IsIn
+
+
+@attrs.define(eq=False)
+class Schedule:
+    """Cached queue of the actors of a map ordered by their NextActTime.
+
+    Entries are not removed when an actor is rescheduled, sleeps, or leaves the map, stale entries are skipped instead.
+    """
+
+    heap: list[tuple[int, int, tcod.ecs.Entity]] = attrs.field(factory=list)
+    """Heap of `(time, order, actor)` entries, `order` keeps actors scheduled at the same time in order."""
+    order: int = 0
+    """Number of entries pushed so far."""
+    built: bool = False
+    """False until the queue is filled by `_get_schedule`, an unpickled queue is empty and must be rebuilt."""
+
+    def push(self, time: int, actor: tcod.ecs.Entity) -> None:
+        """Add an actor to the queue."""
+        heapq.heappush(self.heap, (time, self.order, actor))
+        self.order += 1
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the queue when pickled, it is marked as unbuilt so that `_get_schedule` rebuilds it."""
+        return (self.__class__, ())
+
+
+def get_time(world: tcod.ecs.Registry) -> int:
+    """Return the current game time."""
+    return world[None].components.get(GameTime, 0)
+
+
+def get_action_time(actor: tcod.ecs.Entity, cost: int) -> int:
+    """Return the time it takes `actor` to perform an action of `cost`."""
+    return max(1, cost * DEFAULT_SPEED // actor.components.get(Speed, DEFAULT_SPEED))
+
+
+def _get_schedule(map_: tcod.ecs.Entity) -> Schedule:
+    """Return the schedule of a map, building it from the NextActTime of its actors if it is not cached."""
+    schedule = map_.components.get(Schedule)
+    if schedule is None or not schedule.built:
+        schedule = map_.components[Schedule] = Schedule(built=True)
+        for actor in map_.registry.Q.all_of(components=[AI, NextActTime], relations=[(IsIn, map_)]):
+            schedule.push(actor.components[NextActTime], actor)
+    return schedule
+
+
+def schedule_turn(actor: tcod.ecs.Entity, time: int) -> None:
+    """Schedule the next turn of an actor at `time`, waking it if it was asleep."""
+    if actor.components.get(NextActTime) == time:
+        return
+    actor.components[NextActTime] = time
+    schedule = actor.relation_tag[IsIn].components.get(Schedule)
+    if schedule is not None and schedule.built:
+        schedule.push(time, actor)
+
+
+def wake(actor: tcod.ecs.Entity) -> None:
+    """Schedule an actor to act as soon as possible if it is asleep."""
+    if NextActTime not in actor.components:
+        schedule_turn(actor, get_time(actor.registry))
+
+
+def sleep(actor: tcod.ecs.Entity) -> None:
+    """Stop scheduling the turns of an actor until it is woken."""
+    actor.components.pop(NextActTime, None)
+
+
+def iter_due_actors(map_: tcod.ecs.Entity, until: int) -> Iterator[tcod.ecs.Entity]:
+    """Iterate over the actors of a map due to act up to the time `until`, in order.
+
+    The game time is set to the scheduled time of each actor as it is yielded.
+    Each actor must be rescheduled or put to sleep before the next actor is taken from the queue,
+    or, if the actors are collected first, from the time it was yielded at with the game time set back to it.
+    Actors which are overdue, such as from time spent on another map, act at the current time instead.
+    """
+    world = map_.registry
+    start = get_time(world)
+    schedule = _get_schedule(map_)
+    heap = schedule.heap
+    while heap and heap[0][0] <= until:
+        time, _, actor = heapq.heappop(heap)
+        if (
+            actor.components.get(NextActTime) != time
+            or AI not in actor.components
+            or actor.relation_tag.get(IsIn) is not map_
+        ):
+            continue  # Stale entry.
+        time = max(time, start)
+        world[None].components[GameTime] = time
+        yield actor
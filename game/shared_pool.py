@@ -0,0 +1,134 @@
+"""Process pool for read-only planning over map arrays in shared memory."""
+
+from __future__ import annotations
+
+import atexit
+import concurrent.futures
+import weakref
+from collections.abc import Callable, Sequence
+from multiprocessing import shared_memory
+from typing import Any, Final, NamedTuple, Self
+
+import attrs
+import numpy as np
+import tcod.ecs  # noqa: TC002
+from numpy.typing import NDArray  # noqa: TC002
+
+WORKER_CACHE_SIZE: Final = 16
+"""Maximum number of shared arrays a worker keeps attached."""
+
+
+class SharedArrayRef(NamedTuple):
+    """Picklable reference to an array in shared memory."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+@attrs.define(eq=False)
+class SharedArrays:
+    """Shared memory copies of the arrays of a map by name, freed when this object is deleted."""
+
+    arrays: dict[str, tuple[SharedArrayRef, NDArray[Any]]] = attrs.field(factory=dict)
+    sources: dict[str, NDArray[Any]] = attrs.field(factory=dict)
+    """The read-only array last copied under each name, it is not copied again while it is shared."""
+    blocks: list[shared_memory.SharedMemory] = attrs.field(factory=list)
+
+    def __attrs_post_init__(self) -> None:
+        """Free the shared memory of this object once it is no longer used."""
+        weakref.finalize(self, _free_blocks, self.blocks)
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the shared memory when pickled, arrays are copied again by `share_array`."""
+        return (self.__class__, ())
+
+
+def _free_blocks(blocks: list[shared_memory.SharedMemory]) -> None:
+    """Close and unlink shared memory blocks."""
+    for block in blocks:
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+
+def share_array(map_: tcod.ecs.Entity, name: str, array: NDArray[Any]) -> SharedArrayRef:
+    """Copy `array` into the shared memory of a map under `name` and return a reference to it for worker processes.
+
+    The shared memory is reused while the shape and dtype of `name` stay the same.
+    A read-only array, such as a cached distance field, is only copied when it differs from the last one shared.
+    Writable arrays are copied on every call, which is O(map size),
+    so arrays derived each turn such as an occupied mask cost a full copy per call.
+    """
+    shared = map_.components.get(SharedArrays)
+    if shared is None:
+        shared = map_.components[SharedArrays] = SharedArrays()
+    ref_and_view = shared.arrays.get(name)
+    if ref_and_view is None or ref_and_view[1].shape != array.shape or ref_and_view[1].dtype != array.dtype:
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        shared.blocks.append(block)
+        view: NDArray[Any] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        ref_and_view = shared.arrays[name] = SharedArrayRef(block.name, array.shape, array.dtype.str), view
+    ref, view = ref_and_view
+    if array.flags.writeable or shared.sources.get(name) is not array:
+        view[...] = array
+        shared.sources[name] = array
+    return ref
+
+
+_pool: concurrent.futures.ProcessPoolExecutor | None = None
+"""The process pool, started on first use."""
+_pool_workers = 0
+"""Number of workers of `_pool`."""
+
+_attached: dict[str, tuple[shared_memory.SharedMemory, NDArray[Any]]] = {}
+"""Shared arrays attached by this worker process."""
+
+
+def _attach(ref: SharedArrayRef) -> NDArray[Any]:
+    """Return a read-only view of a shared array from a worker process, without copying it."""
+    if ref.name not in _attached:
+        if len(_attached) >= WORKER_CACHE_SIZE:
+            for block, _ in _attached.values():
+                block.close()
+            _attached.clear()
+        block = shared_memory.SharedMemory(name=ref.name)
+        view: NDArray[Any] = np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=block.buf)
+        view.flags.writeable = False
+        _attached[ref.name] = block, view
+    return _attached[ref.name][1]
+
+
+def _call_with_shared(func: Callable[..., Any], refs: Sequence[SharedArrayRef], args: Sequence[Any]) -> Any:  # noqa: ANN401
+    """Call `func` with the shared arrays of `refs` followed by `args`, this runs in a worker process."""
+    return func(*(_attach(ref) for ref in refs), *args)
+
+
+def _get_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """Return the process pool, restarting it if the number of workers has changed."""
+    global _pool, _pool_workers  # noqa: PLW0603
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+@atexit.register
+def _shutdown_pool() -> None:
+    """Stop the worker processes."""
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+
+
+def map_shared(
+    func: Callable[..., Any], refs: Sequence[SharedArrayRef], chunks: Sequence[Sequence[Any]], workers: int
+) -> list[Any]:
+    """Return `[func(*shared_arrays, *chunk) for chunk in chunks]` computed by a pool of `workers` processes.
+
+    `func` must be a module level function which does not modify the shared arrays.
+    Results are returned in the same order as `chunks`.
+    """
+    pool = _get_pool(workers)
+    return list(pool.map(_call_with_shared, [func] * len(chunks), [refs] * len(chunks), chunks))
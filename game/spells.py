@@ -2,19 +2,24 @@
 
 from __future__ import annotations
 
+import functools
+from typing import Final, Self
+
 import attrs
 import numpy as np
-import tcod.constants
-import tcod.map
 from numpy.typing import NDArray  # noqa: TC002
 from tcod.ecs import Entity  # noqa: TC002
 
 from game.action import ActionResult, Success
 from game.combat import apply_damage
-from game.components import HP, MapShape, MemoryTiles, Name, Position, Tiles, VisibleTiles
+from game.components import HP, MapShape, MemoryVersion, Name, Position, TilesVersion, VisibleTiles
+from game.map_tools import compute_fov_area
 from game.messages import add_message
-from game.tags import IsActor, IsIn
-from game.tiles import TILES
+from game.occupancy import in_mask
+from game.tags import IsActor
+
+SPHERE_CACHE_SIZE: Final = 256
+"""Maximum number of sphere areas cached per map."""
 
 
 @attrs.define
@@ -33,18 +38,55 @@ def cast_at_entity(self, castor: Entity, _item: Entity | None, target: Entity) -
         return Success()
 
 
-def get_sphere(shape: tuple[int, int], pos_ij: tuple[int, int], distance_squared: float) -> NDArray[np.bool]:
-    """Return a boolean mask in shape of a sphere."""
-    height, width = shape
-    ii, jj = np.mgrid[:height, :width]
-    ii -= pos_ij[0]
-    jj -= pos_ij[1]
-    ii *= ii
-    jj *= jj
-
-    ii += jj
-    mask: NDArray[np.bool] = ii <= distance_squared
-    return mask
+@functools.cache
+def get_disc(radius: int) -> NDArray[np.bool]:
+    """Return a read-only sphere of `radius` centered on an array of shape `(radius * 2 + 1, radius * 2 + 1)`."""
+    ii, jj = np.ogrid[-radius : radius + 1, -radius : radius + 1]
+    disc: NDArray[np.bool] = ii * ii + jj * jj <= (radius - 0.5) ** 2
+    disc.flags.writeable = False
+    return disc
+
+
+@attrs.define(eq=False)
+class SphereAreas:
+    """Cached affected areas of spheres on a map by `(target_ij, radius, player_pov, version)`."""
+
+    areas: dict[tuple[tuple[int, int], int, bool, int], tuple[tuple[slice, ...], NDArray[np.bool]]] = attrs.field(
+        factory=dict
+    )
+    """Read-only `(map_slices, area)` results, ordered from least to most recently used."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the areas when pickled, they are computed again by `_get_sphere_area`."""
+        return (self.__class__, ())
+
+
+def _get_sphere_area(
+    map_: Entity,
+    target_ij: tuple[int, int],
+    radius: int,
+    player_pov: bool,  # noqa: FBT001
+    version: int,
+) -> tuple[tuple[slice, ...], NDArray[np.bool]]:
+    """Return the affected area of a sphere on a map as `(map_slices, area)`.
+
+    `area` only covers the part of the map within `radius` of `target_ij` and must not be modified.
+    `version` is the version of the tiles used and is only part of the cache key.
+    """
+    cache = map_.components.get(SphereAreas)
+    if cache is None:
+        map_.components[SphereAreas] = cache = SphereAreas()
+    key = target_ij, radius, player_pov, version
+    result = cache.areas.pop(key, None)
+    if result is None:
+        window_slices, map_slices, visible = compute_fov_area(map_, target_ij, radius, memory=player_pov)
+        area = visible & get_disc(radius)[window_slices]
+        area.flags.writeable = False
+        result = map_slices, area
+        if len(cache.areas) >= SPHERE_CACHE_SIZE:
+            del cache.areas[next(iter(cache.areas))]  # Discard the least recently used result.
+    cache.areas[key] = result
+    return result
 
 
 @attrs.define
@@ -53,16 +95,24 @@ class SphereAOE:
 
     radius: int
 
-    def get_affected_area(self, target: Position, *, player_pov: bool = False) -> NDArray[np.bool]:
-        """Return the affected area as a boolean array."""
+    def get_affected_slices(
+        self, target: Position, *, player_pov: bool = False
+    ) -> tuple[tuple[slice, ...], NDArray[np.bool]]:
+        """Return the affected area as `(map_slices, area)`, where `area` only covers `map_slices` of the map.
+
+        Results are cached per tiles version and must not be modified.
+        """
         if not target.map.components[VisibleTiles][target.ij]:
-            return np.zeros(target.map.components[MapShape], dtype=bool)
-        return tcod.map.compute_fov(
-            TILES["transparent"][target.map.components[Tiles if not player_pov else MemoryTiles]],
-            pov=target.ij,
-            radius=self.radius,
-            algorithm=tcod.constants.FOV_SYMMETRIC_SHADOWCAST,
-        ) & get_sphere(target.map.components[MapShape], target.ij, distance_squared=(self.radius - 0.5) ** 2)
+            return (slice(0, 0), slice(0, 0)), np.zeros((0, 0), dtype=bool)
+        version = target.map.components.get(MemoryVersion if player_pov else TilesVersion, 0)
+        return _get_sphere_area(target.map, target.ij, self.radius, player_pov, version)
+
+    def get_affected_area(self, target: Position, *, player_pov: bool = False) -> NDArray[np.bool]:
+        """Return the affected area as a boolean array the shape of the map, used to highlight the area."""
+        map_slices, area = self.get_affected_slices(target, player_pov=player_pov)
+        affected_area = np.zeros(target.map.components[MapShape], dtype=bool)
+        affected_area[map_slices] = area
+        return affected_area
 
 
 @attrs.define
@@ -73,13 +123,11 @@ class Fireball(SphereAOE):
 
     def cast_at_position(self, castor: Entity, _item: Entity | None, target: Position) -> ActionResult:
         """Apply fireball to affected area."""
-        affected_area = self.get_affected_area(target)
+        map_slices, affected_area = self.get_affected_slices(target)
 
         targets_hit = False
-        for entity in castor.registry.Q.all_of(
-            components=[Position, HP], tags=[IsActor], relations=[(IsIn, target.map)]
-        ):
-            if not affected_area[entity.components[Position].ij]:
+        for entity in in_mask(target.map, affected_area, area=map_slices):
+            if HP not in entity.components or IsActor not in entity.tags:
                 continue
             add_message(
                 castor.registry,
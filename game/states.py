@@ -19,24 +19,24 @@
 import game.color
 import game.world_init
 from game.action import Action  # noqa: TC001
-from game.action_tools import do_player_action
-from game.actions import ApplyItem, Bump, DropItem, PickupItem, TakeStairs
+from game.action_tools import do_player_action, do_player_actions
+from game.actions import ApplyItem, AutoExplore, Bump, DropItem, FollowPath, PickupItem, Run, TakeStairs
 from game.actor_tools import get_player_actor, level_up, required_xp_for_level
 from game.components import HP, XP, Defense, Level, MaxHP, Position, Power
 from game.constants import DIRECTION_KEYS
 from game.entity_tools import get_desc
+from game.explore import is_known_walkable
 from game.item_tools import get_inventory_keys
 from game.messages import add_message
-from game.rendering import main_render
+from game.rendering import main_render, render_overview
 from game.state import State
-from game.tags import IsPlayer
 
 
 @attrs.define
 class InGame(State):
     """In-game main player control state."""
 
-    def on_event(self, event: tcod.event.Event) -> State:  # noqa: C901, PLR0911
+    def on_event(self, event: tcod.event.Event) -> State:  # noqa: C901, PLR0911, PLR0912
         """Handle basic events and movement."""
         player = get_player_actor(g.world)
         match event:
@@ -52,6 +52,10 @@ def on_event(self, event: tcod.event.Event) -> State:  # noqa: C901, PLR0911
                 return ItemSelect.player_verb(player, "drop", DropItem)
             case tcod.event.KeyDown(sym=KeySym.SLASH):
                 return PositionSelect.init_look()
+            case tcod.event.KeyDown(sym=KeySym.m):
+                return OverviewMap()
+            case tcod.event.KeyDown(sym=KeySym.o):
+                return do_player_actions(player, AutoExplore())
             case tcod.event.KeyDown(sym=KeySym.PERIOD, mod=mod) if mod & Modifier.SHIFT:
                 return do_player_action(player, TakeStairs("down"))
             case tcod.event.KeyDown(sym=KeySym.COMMA, mod=mod) if mod & Modifier.SHIFT:
@@ -60,8 +64,16 @@ def on_event(self, event: tcod.event.Event) -> State:  # noqa: C901, PLR0911
                 return do_player_action(player, TakeStairs("down"))
             case tcod.event.KeyDown(scancode=Scancode.NONUSBACKSLASH, mod=mod) if not mod & Modifier.SHIFT:
                 return do_player_action(player, TakeStairs("up"))
+            case tcod.event.KeyDown(sym=sym, mod=mod) if (
+                sym in DIRECTION_KEYS and DIRECTION_KEYS[sym] != (0, 0) and mod & Modifier.SHIFT
+            ):
+                return do_player_actions(player, Run(DIRECTION_KEYS[sym]))
             case tcod.event.KeyDown(sym=sym) if sym in DIRECTION_KEYS:
                 return do_player_action(player, Bump(DIRECTION_KEYS[sym]))
+            case tcod.event.MouseButtonDown(button=tcod.event.MouseButton.LEFT, position=position):
+                dest = player.components[Position].replace(*position)
+                if is_known_walkable(dest):
+                    return do_player_actions(player, FollowPath.over_memory(player, dest))
         return self
 
     def on_draw(self, console: tcod.console.Console) -> None:
@@ -139,7 +151,7 @@ class PositionSelect:
     @classmethod
     def init_look(cls) -> Self:
         """Initialize a basic look state."""
-        (player,) = g.world.Q.all_of(tags=[IsPlayer])
+        player = get_player_actor(g.world)
         g.world["cursor"].components[Position] = player.components[Position]
         return cls(pick_callback=lambda _: InGame(), cancel_callback=InGame)
 
@@ -172,6 +184,22 @@ def on_draw(self, console: tcod.console.Console) -> None:
         main_render(g.world, console, highlight=highlight)
 
 
+@attrs.define
+class OverviewMap(State):
+    """Downsampled view of the whole map."""
+
+    def on_event(self, event: tcod.event.Event) -> State:
+        """Return to the game on any key."""
+        match event:
+            case tcod.event.KeyDown():
+                return InGame()
+        return self
+
+    def on_draw(self, console: tcod.console.Console) -> None:
+        """Render the map overview."""
+        render_overview(g.world, console)
+
+
 @attrs.define
 class MainMenu:
     """Handle the main menu rendering and input."""
@@ -7,9 +7,6 @@
 IsPlayer: Final = "IsPlayer"
 """Player entity."""
 
-IsGhost: Final = "IsGhost"
-"""Entity last seen position."""
-
 IsActor: Final = "IsActor"
 """Creature category."""
 
@@ -22,6 +19,9 @@
 IsAlive: Final = "IsAlive"
 """Enemy is spawned and has not died."""
 
+IsDormant: Final = "IsDormant"
+"""Actor is parked until it is roused or its next turn comes up."""
+
 IsIn: Final = "IsIn"
 """Entity is-in relation."""
 
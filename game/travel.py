@@ -2,43 +2,341 @@
 
 from __future__ import annotations
 
+import heapq
+import itertools
+from typing import Final, Self
+
+import attrs
+import numpy as np
 import tcod.ecs
+import tcod.ecs.callbacks
 import tcod.path
+from numpy.typing import NDArray  # noqa: TC002
+
+from game.changes import Changes
+from game.components import MapShape, Position, TilesVersion
+from game.map_tools import get_radius_slices, get_tile_layer
+from game.occupancy import get_occupancy, is_blocked
+from game.tags import IsIn
+
+DIRECTIONS: Final = ((0, -1), (-1, 0), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1))
+"""Directions to neighboring tiles, cardinals first."""
+
+BLOCKER_PENALTY: Final = 10
+"""Cost added to tiles with a blocking entity.
+
+A lower number means more enemies will crowd behind each other in hallways.
+A higher number means enemies will take longer paths in order to surround the player.
+"""
+
+ROOM_PLAN_MIN_DISTANCE: Final = 80
+"""Distance at which `plan_path` starts to route over the room graph, closer destinations get the shortest path.
+
+This covers every path on a standard 80 by 45 map, where a full search takes well under a millisecond.
+"""
+
+
+@attrs.define(eq=False)
+class PathGraph:
+    """Long-lived pathfinding costs of a map, kept in sync with the blocking entities on it."""
+
+    tiles_version: int = -1
+    """The TilesVersion `cost` was computed from."""
+    cost: NDArray[np.int16] = attrs.field(factory=lambda: np.zeros((0, 0), dtype=np.int16))
+    """Walk cost of each tile including the penalty for blocking entities."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the costs when pickled, the unset version makes `get_path_graph` recompute them."""
+        return (self.__class__, ())
+
+
+@attrs.define(eq=False)
+class DistanceField:
+    """Cached walking distances of every tile on a map to a destination."""
+
+    dest_ij: tuple[int, int] = (-1, -1)
+    tiles_version: int = -1
+    distance: NDArray[np.int32] = attrs.field(factory=lambda: np.zeros((0, 0), dtype=np.int32))
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the distances when pickled, the unset version makes `get_distance_field` recompute them."""
+        return (self.__class__, ())
+
+
+@attrs.define(eq=False)
+class RoomGraph:
+    """The rooms of a generated map and the tunnels between them.
+
+    Tunnel tiles outside of a room belong to the region of the last room the tunnel passed through.
+    """
+
+    regions: NDArray[np.int16]
+    """Index of the room each tile belongs to, or -1 for tiles which are not part of any room or tunnel."""
+    rooms: list[tuple[slice, slice]] = attrs.field(factory=list)
+    """The inner area of each room."""
+    centers: list[tuple[int, int]] = attrs.field(factory=list)
+    """The center `ij` coordinate of each room."""
+    links: list[dict[int, int]] = attrs.field(factory=list)
+    """The rooms connected to each room by a tunnel, with the distance between their centers."""
+
+    def add_room(self, inner: tuple[slice, slice], center_ij: tuple[int, int]) -> int:
+        """Add a room and return its index."""
+        index = len(self.rooms)
+        self.rooms.append(inner)
+        self.centers.append(center_ij)
+        self.links.append({})
+        self.regions[inner] = index
+        return index
+
+    def room_at(self, ij: tuple[int, int]) -> int:
+        """Return the index of the room with `ij` inside of it, or -1 if `ij` is not inside of a room."""
+        region = int(self.regions[ij])
+        if region < 0:
+            return -1
+        i, j = self.rooms[region]
+        return region if i.start <= ij[0] < i.stop and j.start <= ij[1] < j.stop else -1
+
+    def add_tunnel(self, room: int, indices: tuple[NDArray[np.intc], NDArray[np.intc]]) -> None:
+        """Add a tunnel dug from the center of `room`, every room the tunnel passes through is linked in order."""
+        for ij in zip(indices[0].tolist(), indices[1].tolist(), strict=True):
+            other = self.room_at(ij)
+            if other == -1:
+                if self.regions[ij] == -1:
+                    self.regions[ij] = room
+                continue
+            if other != room:
+                self.links[room][other] = self.links[other][room] = _chebyshev(self.centers[room], self.centers[other])
+                room = other
+
+    def route(self, start_room: int, dest_room: int) -> list[int]:
+        """Return the rooms to pass through from `start_room` to `dest_room`, including both.
+
+        Returns an empty list if the rooms are not connected.
+        """
+        distances = {start_room: 0}
+        came_from: dict[int, int] = {}
+        heap = [(0, start_room)]
+        while heap:
+            distance, room = heapq.heappop(heap)
+            if room == dest_room:
+                route = [room]
+                while route[-1] in came_from:
+                    route.append(came_from[route[-1]])
+                return route[::-1]
+            if distance > distances[room]:
+                continue
+            for other, link_distance in self.links[room].items():
+                other_distance = distance + link_distance
+                if other_distance < distances.get(other, other_distance + 1):
+                    distances[other] = other_distance
+                    came_from[other] = room
+                    heapq.heappush(heap, (other_distance, other))
+        return []
+
+
+@attrs.define(eq=False)
+class RoomLegs:
+    """Cached paths between the centers of linked rooms of a RoomGraph."""
+
+    tiles_version: int = -1
+    legs: dict[tuple[int, int], list[tuple[int, int]]] = attrs.field(factory=dict)
+    """Paths from the center of one room to the center of the next, excluding the start."""
+
+    def __reduce__(self) -> tuple[type[Self], tuple[()]]:
+        """Discard the legs when pickled, the unset version makes `_get_room_leg` find them again."""
+        return (self.__class__, ())
+
+
+def _chebyshev(a: tuple[int, int], b: tuple[int, int]) -> int:
+    """Return the Chebyshev distance between two points."""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
 
-from game.components import Position, Tiles
-from game.tags import IsBlocking, IsIn
-from game.tiles import TILES
 
+def get_path_graph(map_: tcod.ecs.Entity) -> PathGraph:
+    """Return the pathfinding costs of a map.
 
-def path_to(actor: tcod.ecs.Entity, dest: Position) -> list[Position]:
+    Costs are updated where blocking entities have moved, started, or stopped blocking since the last call.
+    When the tiles change only the areas changed this turn are recomputed, or all of them if the costs are older.
+    """
+    graph = map_.components.get(PathGraph)
+    if graph is None:
+        graph = map_.components[PathGraph] = PathGraph()
+    version = map_.components.get(TilesVersion, 0)
+    occupancy = get_occupancy(map_)
+    walk_cost = get_tile_layer(map_, "walk_cost")
+    if graph.tiles_version != version:
+        blocked = occupancy.blockers > 0
+        changes = map_.components.get(Changes)
+        areas: list[tuple[slice, ...]] = [(slice(None), slice(None))]
+        if changes is not None and changes.tiles_version == graph.tiles_version and graph.cost.shape == walk_cost.shape:
+            areas = changes.tiles
+        else:
+            graph.cost = np.empty(walk_cost.shape, dtype=np.int16)
+        for area in areas:
+            graph.cost[area] = walk_cost[area] + np.where(blocked[area] & (walk_cost[area] > 0), BLOCKER_PENALTY, 0)
+        graph.tiles_version = version
+    for ij in occupancy.blockers_changed:
+        graph.cost[ij] = walk_cost[ij] + BLOCKER_PENALTY if walk_cost[ij] and occupancy.blockers[ij] else walk_cost[ij]
+    occupancy.blockers_changed.clear()
+    return graph
+
+
+def _local_path(
+    map_: tcod.ecs.Entity, start_ij: tuple[int, int], dest_ij: tuple[int, int], area: tuple[slice, ...]
+) -> list[tuple[int, int]]:
+    """Return a path from `start_ij` to `dest_ij` which stays within `area` of the map, excluding the start.
+
+    This uses the simpler A* pathfinder which is much faster to set up than `tcod.path.Pathfinder` for small areas.
+    """
+    offset_i, offset_j = area[0].start, area[1].start
+    astar = tcod.path.AStar(get_path_graph(map_).cost[area], diagonal=1.5)
+    path = astar.get_path(start_ij[0] - offset_i, start_ij[1] - offset_j, dest_ij[0] - offset_i, dest_ij[1] - offset_j)
+    return [(i + offset_i, j + offset_j) for i, j in path]
+
+
+def _bounding_area(*areas: tuple[slice, slice] | tuple[int, int]) -> tuple[slice, slice]:
+    """Return the smallest area covering every given area or `ij` point, padded by one tile."""
+    i_start = min(area[0].start if isinstance(area[0], slice) else area[0] for area in areas)
+    i_stop = max(area[0].stop if isinstance(area[0], slice) else area[0] + 1 for area in areas)
+    j_start = min(area[1].start if isinstance(area[1], slice) else area[1] for area in areas)
+    j_stop = max(area[1].stop if isinstance(area[1], slice) else area[1] + 1 for area in areas)
+    return slice(max(0, i_start - 1), i_stop + 1), slice(max(0, j_start - 1), j_stop + 1)
+
+
+def path_to(
+    actor: tcod.ecs.Entity, dest: Position, *, max_distance: int | None = None, cost: NDArray[np.integer] | None = None
+) -> list[Position]:
     """Compute and return a path to from actor to dest.
 
+    If `max_distance` is given then the search is limited to tiles within that many steps of the actor.
+    If `cost` is given then it is walked over instead of the costs from `get_path_graph`.
+
     If there is no valid path then returns an empty list.
     """
     map_ = actor.relation_tag[IsIn]
     assert dest.map is map_
-
-    # Copy the walkable array.
-    cost = TILES["walk_cost"][map_.components[Tiles]]
-
-    for other in actor.registry.Q.all_of(tags=[IsBlocking], relations=[(IsIn, map_)]):
-        other_pos = other.components[Position]
-        # Check that an entity blocks movement and the cost isn't zero (blocking.)
-        if cost[other_pos.ij]:
-            # Add to the cost of a blocked position.
-            # A lower number means more enemies will crowd behind each other in
-            # hallways.  A higher number means enemies will take longer paths in
-            # order to surround the player.
-            cost[other_pos.ij] += 10
+    start = actor.components[Position]
+    if cost is None:
+        cost = get_path_graph(map_).cost
+    offset_i = offset_j = 0
+    if max_distance is not None:
+        if _chebyshev(start.ij, dest.ij) > max_distance:
+            return []
+        _, map_slices = get_radius_slices(cost.shape, start.ij, max_distance)
+        cost = cost[map_slices]
+        offset_i, offset_j = map_slices[0].start, map_slices[1].start
 
     # Create a graph from the cost array and pass that graph to a new pathfinder.
     graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
     pathfinder = tcod.path.Pathfinder(graph)
 
-    pathfinder.add_root(actor.components[Position].ij)  # Start position.
+    pathfinder.add_root((start.y - offset_i, start.x - offset_j))  # Start position.
 
     # Compute the path to the destination and remove the starting point.
-    path: list[list[int]] = pathfinder.path_to(dest.ij)[1:].tolist()
+    path: list[list[int]] = pathfinder.path_to((dest.y - offset_i, dest.x - offset_j))[1:].tolist()
 
     # Convert from List[List[int]] to List[Tuple[int, int]].
-    return [Position(ij_index[1], ij_index[0], map_) for ij_index in path]
+    return [Position(ij_index[1] + offset_j, ij_index[0] + offset_i, map_) for ij_index in path]
+
+
+def _get_room_leg(map_: tcod.ecs.Entity, room_graph: RoomGraph, room_a: int, room_b: int) -> list[tuple[int, int]]:
+    """Return the cached path from the center of `room_a` to the center of the linked `room_b`."""
+    version = map_.components.get(TilesVersion, 0)
+    cache = map_.components.get(RoomLegs)
+    if cache is None or cache.tiles_version != version:
+        map_.components[RoomLegs] = cache = RoomLegs(version)
+    leg = cache.legs.get((room_a, room_b))
+    if leg is None:
+        area = _bounding_area(room_graph.rooms[room_a], room_graph.rooms[room_b])
+        cache.legs[room_a, room_b] = leg = _local_path(
+            map_, room_graph.centers[room_a], room_graph.centers[room_b], area
+        )
+    return leg
+
+
+def plan_path(actor: tcod.ecs.Entity, dest: Position) -> list[Position]:
+    """Return a path from actor to dest, planned over the room graph of the map for distant destinations.
+
+    A route of rooms is found first, then only the ends of the path are searched around their rooms,
+    the legs between room centers are cached.
+    The path passes through the center of each room on the route, so it can be several times longer than the shortest
+    path, but it is much cheaper to find than a search over a large map.
+    Uses `path_to` for destinations closer than `ROOM_PLAN_MIN_DISTANCE`, on maps without a room graph,
+    or when the route can not be refined.
+    """
+    map_ = actor.relation_tag[IsIn]
+    assert dest.map is map_
+    room_graph = map_.components.get(RoomGraph)
+    start = actor.components[Position]
+    if room_graph is None or _chebyshev(start.ij, dest.ij) < ROOM_PLAN_MIN_DISTANCE:
+        return path_to(actor, dest)
+    start_room = int(room_graph.regions[start.ij])
+    dest_room = int(room_graph.regions[dest.ij])
+    route = room_graph.route(start_room, dest_room) if start_room >= 0 and dest_room >= 0 else []
+    if not route:
+        return path_to(actor, dest)
+
+    if len(route) <= 2:  # noqa: PLR2004
+        area = _bounding_area(start.ij, dest.ij, *(room_graph.rooms[room] for room in route))
+        path = _local_path(map_, start.ij, dest.ij, area)
+    else:
+        first_center = room_graph.centers[route[1]]
+        last_center = room_graph.centers[route[-1]]
+        path = _local_path(
+            map_, start.ij, first_center, _bounding_area(start.ij, room_graph.rooms[route[0]], first_center)
+        )
+        legs = [_get_room_leg(map_, room_graph, room_a, room_b) for room_a, room_b in itertools.pairwise(route[1:])]
+        last_leg = _local_path(
+            map_, last_center, dest.ij, _bounding_area(last_center, room_graph.rooms[route[-1]], dest.ij)
+        )
+        if (not path and start.ij != first_center) or not all(legs) or (not last_leg and last_center != dest.ij):
+            path = []  # The route could not be refined.
+        else:
+            path += itertools.chain.from_iterable(legs)
+            path += last_leg
+    if not path and start != dest:
+        return path_to(actor, dest)
+    return [Position(j, i, map_) for i, j in path]
+
+
+def get_distance_field(dest: Position) -> NDArray[np.int32]:
+    """Return the read-only walking distance to `dest` from every tile of its map.
+
+    The result is shared by all callers and is only recomputed when `dest` or the tiles of its map change.
+    Unreachable tiles are set to the maximum value of the array.
+    """
+    map_ = dest.map
+    version = map_.components.get(TilesVersion, 0)
+    cache = map_.components.get(DistanceField)
+    if cache is None or cache.dest_ij != dest.ij or cache.tiles_version != version:
+        distance = tcod.path.maxarray(map_.components[MapShape], dtype=np.int32)
+        distance[dest.ij] = 0
+        tcod.path.dijkstra2d(distance, get_tile_layer(map_, "walk_cost"), cardinal=2, diagonal=3, out=distance)
+        distance.flags.writeable = False
+        map_.components[DistanceField] = cache = DistanceField(dest.ij, version, distance)
+    return cache.distance
+
+
+def path_downhill(actor: tcod.ecs.Entity, distance: NDArray[np.int32]) -> list[Position]:
+    """Return a path from actor following `distance` downhill to its lowest point.
+
+    The first step avoids blocking entities, if every downhill step is blocked then returns an empty list.
+    """
+    actor_pos = actor.components[Position]
+    height, width = distance.shape
+    steps = sorted(
+        (distance.item(actor_pos.y + dy, actor_pos.x + dx), (dx, dy))
+        for dx, dy in DIRECTIONS
+        if 0 <= actor_pos.x + dx < width
+        and 0 <= actor_pos.y + dy < height
+        and distance.item(actor_pos.y + dy, actor_pos.x + dx) < distance.item(actor_pos.ij)
+    )
+    for _, direction in steps:
+        first_step = actor_pos + direction
+        if not is_blocked(first_step):
+            break
+    else:
+        return []
+
+    path: list[list[int]] = tcod.path.hillclimb2d(distance, first_step.ij, cardinal=True, diagonal=True).tolist()
+    return [Position(ij_index[1], ij_index[0], actor_pos.map) for ij_index in path]
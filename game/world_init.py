@@ -34,10 +34,10 @@
 from game.tags import IsActor, IsIn, IsItem, IsPlayer
 
 
-def new_world() -> tcod.ecs.Registry:
-    """Return a new world."""
+def new_world(seed: int | None = None) -> tcod.ecs.Registry:
+    """Return a new world, generated from `seed` if one is given."""
     world = tcod.ecs.Registry()
-    world[None].components[Random] = Random()
+    world[None].components[Random] = Random(seed)
     world[None].components[MessageLog] = MessageLog()
 
     init_creatures(world)
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import logging
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
 from typing import NoReturn
@@ -79,4 +80,5 @@ def main() -> NoReturn:  # noqa: C901
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required by the AI worker processes in frozen builds.
     main()
@@ -0,0 +1,60 @@
+"""Tests for the occupancy index of maps."""
+
+from __future__ import annotations
+
+import tcod.ecs
+
+from game.components import Position, Tiles
+from game.map_tools import new_map
+from game.occupancy import Occupancy, get_entities_at, get_occupancy, is_blocked, set_blocking
+from game.tiles import TILE_NAMES
+from game.travel import PathGraph, get_path_graph
+
+
+def _new_map() -> tcod.ecs.Entity:
+    """Return a map of floor surrounded by walls."""
+    map_ = new_map(tcod.ecs.World(), (45, 80))
+    map_.components[Tiles][:] = TILE_NAMES["wall"]
+    map_.components[Tiles][1:-1, 1:-1] = TILE_NAMES["floor"]
+    return map_
+
+
+def _assert_matches_rebuild(map_: tcod.ecs.Entity) -> None:
+    """Assert that the occupancy and path costs of a map match ones built from scratch."""
+    occupancy = get_occupancy(map_)
+    cost = get_path_graph(map_).cost.copy()
+    map_.components.pop(Occupancy)
+    map_.components.pop(PathGraph)
+    assert (get_occupancy(map_).counts == occupancy.counts).all()
+    assert (get_occupancy(map_).blockers == occupancy.blockers).all()
+    assert (get_path_graph(map_).cost == cost).all()
+
+
+def test_positions_outside_of_map() -> None:
+    """Entities outside of the map, such as the look cursor over the interface, are ignored by the index."""
+    map_ = _new_map()
+    get_path_graph(map_)
+    cursor = map_.registry["cursor"]
+    cursor.components[Position] = Position(10, 10, map_)
+    cursor.components[Position] = Position(10, 47, map_)
+    cursor.components[Position] = Position(-1, 10, map_)
+    assert not is_blocked(Position(-1, 10, map_))
+    set_blocking(cursor, True)
+    assert get_occupancy(map_).counts.sum() == 0
+    cursor.components[Position] = Position(10, 10, map_)
+    assert get_entities_at(Position(10, 10, map_)) == [cursor]
+    assert is_blocked(Position(10, 10, map_))
+    _assert_matches_rebuild(map_)
+
+
+def test_blocking_changes() -> None:
+    """Path costs follow entities which move, start blocking, or stop blocking."""
+    map_ = _new_map()
+    get_path_graph(map_)
+    actor = map_.registry[object()]
+    actor.components[Position] = Position(5, 5, map_)
+    set_blocking(actor, True)
+    actor.components[Position] = Position(6, 5, map_)
+    _assert_matches_rebuild(map_)
+    set_blocking(actor, False)
+    _assert_matches_rebuild(map_)
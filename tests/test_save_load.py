@@ -0,0 +1,246 @@
+"""Tests for the caches of a world surviving a save and load."""
+
+from __future__ import annotations
+
+import importlib
+import pkgutil
+import random
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+import tcod.ecs  # noqa: TC002
+
+import game
+import game.actor_table
+import game.changes
+import game.combat
+import game.commands
+import game.dormancy
+import game.explore
+import game.item_tools
+import game.map_tools
+import game.occupancy
+import game.overview
+import game.perception
+import game.queries
+import game.scheduler
+import game.shared_pool
+import game.spells
+import game.travel
+import game.world_init
+from game.action_tools import do_player_action
+from game.actions import Bump
+from game.actor_tools import get_player_actor, spawn_actor
+from game.components import HP, MaxHP, NextActTime, Position
+from game.tags import IsActor, IsIn, IsItem, IsPlayer
+from game.world_tools import load_world, save_world
+
+NOT_SAVED: frozenset[type] = frozenset({game.commands.CommandBuffer})
+"""Caches which only exist during a call and are never part of a saved world."""
+
+
+def _player_and_map(world: tcod.ecs.Registry) -> tuple[tcod.ecs.Entity, tcod.ecs.Entity]:
+    player = get_player_actor(world)
+    return player, player.relation_tag[IsIn]
+
+
+def _schedule(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    heap = game.scheduler._get_schedule(map_).heap  # noqa: SLF001
+    return {(time, actor) for time, _, actor in heap if actor.components.get(NextActTime) == time}
+
+
+def _occupancy(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    occupancy = game.occupancy.get_occupancy(map_)
+    entities = {ij: set(here) for ij, here in occupancy.entities.items()}
+    return occupancy.counts.tolist(), occupancy.blockers.tolist(), entities
+
+
+def _inventory(world: tcod.ecs.Registry) -> object:
+    player, _ = _player_and_map(world)
+    index = game.item_tools._get_index(player)  # noqa: SLF001
+    return index.stacks, index.keys, index.slots
+
+
+def _actor_table(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    table = game.actor_table.get_actor_table(map_)
+    return {
+        actor: tuple(int(table[name][row]) for name in game.actor_table.COLUMNS)
+        for row, actor in enumerate(table.entities)
+    }
+
+
+def _dormant(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    index = game.dormancy._get_index(map_)  # noqa: SLF001
+    return {room: actors for room, actors in index.rooms.items() if actors}, {
+        block: actors for block, actors in index.blocks.items() if actors
+    }
+
+
+def _fov(world: tcod.ecs.Registry) -> object:
+    player, map_ = _player_and_map(world)
+    map_slices, visible = game.perception.get_fov(map_, player.components[Position].ij, 8)
+    return map_slices, visible.tolist()
+
+
+def _queries(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    return (
+        set(game.queries.player_query(world)),
+        set(game.queries.actors_in_query(world, map_)),
+        set(game.queries.items_in_query(world, map_)),
+        set(game.queries.graphics_in_query(world, map_)),
+    )
+
+
+def _path_graph(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    return game.travel.get_path_graph(map_).cost.tolist()
+
+
+def _distance_field(world: tcod.ecs.Registry) -> object:
+    player, _ = _player_and_map(world)
+    return game.travel.get_distance_field(player.components[Position]).tolist()
+
+
+def _room_legs(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    room_graph = map_.components[game.travel.RoomGraph]
+    return {
+        (room_a, room_b): game.travel._get_room_leg(map_, room_graph, room_a, room_b)  # noqa: SLF001
+        for room_a, links in enumerate(room_graph.links)
+        for room_b in links
+    }
+
+
+def _shared_arrays(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    game.shared_pool.share_array(map_, "cost", game.travel.get_path_graph(map_).cost)
+    return map_.components[game.shared_pool.SharedArrays].arrays["cost"][1].tolist()
+
+
+def _changes(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    game.map_tools.mark_tiles_changed(map_, (slice(1, 2), slice(1, 2)))
+    return game.travel.get_path_graph(map_).cost.tolist()  # The only consumer of tile changes.
+
+
+def _entity_changes(world: tcod.ecs.Registry) -> object:
+    player, map_ = _player_and_map(world)
+    changes = game.changes.get_entity_changes(map_)
+    game.changes.reset_changes(map_)
+    player.components[HP] -= 1
+    return changes.moved, changes.spawned, changes.removed, changes.stats
+
+
+def _combat_stats(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    actors = world.Q.all_of(components=[Position], tags=[IsActor], relations=[(IsIn, map_)])
+    return {actor: (game.combat.get_attack(actor), game.combat.get_defense(actor)) for actor in actors}
+
+
+def _overview(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    memory, visible = game.overview.get_overview(map_, 1)
+    return memory.tolist(), visible.tolist()
+
+
+def _frontier(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    return game.explore.get_frontier_distance(map_).tolist()
+
+
+def _tile_layers(world: tcod.ecs.Registry) -> object:
+    _, map_ = _player_and_map(world)
+    return game.map_tools.get_tile_layer(map_, "walk_cost").tolist()
+
+
+def _sphere_areas(world: tcod.ecs.Registry) -> object:
+    player, _ = _player_and_map(world)
+    return game.spells.SphereAOE(3).get_affected_area(player.components[Position]).tolist()
+
+
+CACHE_VIEWS: dict[type, Callable[[tcod.ecs.Registry], object]] = {
+    game.scheduler.Schedule: _schedule,
+    game.occupancy.Occupancy: _occupancy,
+    game.item_tools.InventoryIndex: _inventory,
+    game.actor_table.ActorTable: _actor_table,
+    game.dormancy.DormantIndex: _dormant,
+    game.perception.FOVCache: _fov,
+    game.queries.QueryCache: _queries,
+    game.travel.PathGraph: _path_graph,
+    game.travel.DistanceField: _distance_field,
+    game.travel.RoomLegs: _room_legs,
+    game.shared_pool.SharedArrays: _shared_arrays,
+    game.changes.Changes: _changes,
+    game.changes.EntityChanges: _entity_changes,
+    game.combat.CombatStats: _combat_stats,
+    game.overview.Overview: _overview,
+    game.explore.Frontier: _frontier,
+    game.map_tools.TileLayers: _tile_layers,
+    game.spells.SphereAreas: _sphere_areas,
+}
+"""Functions returning what a cache answers for the player's map, by cache type."""
+
+
+def _iter_cache_types() -> Iterator[type]:
+    """Yield the classes of the game package which discard their data when pickled."""
+    for module_info in pkgutil.iter_modules(game.__path__):
+        module = importlib.import_module(f"game.{module_info.name}")
+        for value in vars(module).values():
+            if isinstance(value, type) and value.__module__ == module.__name__ and "__reduce__" in vars(value):
+                yield value
+
+
+@pytest.fixture(scope="module")
+def saved_world(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Return the path of a saved world which was played for a while, so that its caches are in use."""
+    world = game.world_init.new_world(seed=0)
+    rng = random.Random(0)
+    for _ in range(50):
+        player = get_player_actor(world)
+        player.components[HP] = player.components[MaxHP] = 10_000
+        do_player_action(player, Bump((rng.randint(-1, 1), rng.randint(-1, 1))))
+    for view in CACHE_VIEWS.values():
+        view(world)
+    path = tmp_path_factory.mktemp("save") / "world.sav"
+    save_world(world, path)
+    return path
+
+
+def _disturb(world: tcod.ecs.Registry) -> None:
+    """Change the world before any cache is used, as the first action after a load would."""
+    player, map_ = _player_and_map(world)
+    pos = player.components[Position]
+    item = next(iter(world.Q.all_of(components=[Position], tags=[IsItem], relations=[(IsIn, map_)])), None)
+    if item is None:
+        item = world["health_potion"].instantiate()
+    item.components[Position] = pos
+    monsters = world.Q.all_of(components=[HP, Position], tags=[IsActor], relations=[(IsIn, map_)]).none_of(
+        tags=[IsPlayer]
+    )
+    monster = next(iter(monsters), None)
+    if monster is None:
+        monster = spawn_actor(world["orc"], pos)
+    monster.components[HP] -= 1
+
+
+def test_every_cache_is_checked() -> None:
+    """Every cache which discards its data when pickled must have a view in CACHE_VIEWS."""
+    assert set(_iter_cache_types()) - NOT_SAVED == set(CACHE_VIEWS)
+
+
+@pytest.mark.parametrize("cache_type", list(CACHE_VIEWS), ids=lambda cache_type: cache_type.__name__)
+def test_cache_after_load(saved_world: Path, cache_type: type) -> None:
+    """A cache of a loaded world must give the same answers as one built from scratch."""
+    world = load_world(saved_world)
+    _disturb(world)
+    view = CACHE_VIEWS[cache_type]
+    loaded = view(world)
+    for entity in list(world.Q.all_of(components=[cache_type])):
+        entity.components.pop(cache_type)
+    assert view(world) == loaded